@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import numpy as np
+from pathlib import Path
+from collections import OrderedDict
+
+# Réductions groupées des résultats (par classe d'occupation du sol, par IRIS...) avec np.bincount :
+# un seul parcours des cellules par colonne, quel que soit le nombre de groupes, au lieu d'un masque complet par groupe
+
+# Étiquettes compactes (0 à n - 1) d'un raster de codes quelconques, dans le plus petit type entier possible
+# Retourne (codes, raster d'étiquettes) ; calculé une seule fois, à l'écriture du bundle des données préparées
+def labelRaster(raster):
+    codes, labels = np.unique(raster, return_inverse=True)
+    dtype = np.uint8 if len(codes) <= 256 else np.uint16 if len(codes) <= 65536 else np.uint32
+    return codes, labels.astype(dtype).reshape(np.shape(raster))
+
+# Sommes par groupe de chaque colonne (dictionnaire nom: valeurs par cellule) ; les colonnes booléennes sont comptées
+# labels : étiquette entière >= 0 de chaque cellule, size : nombre de groupes
+# Les sommes de colonnes entières sont exactes (entiers int64), les autres sont des flottants
+def groupSums(labels, size, columns):
+    labels = np.ravel(labels)
+    table = OrderedDict()
+    for name, values in columns.items():
+        values = np.ravel(values)
+        if values.dtype == np.bool_:
+            table[name] = np.bincount(labels[values], minlength=size)
+        elif np.issubdtype(values.dtype, np.integer):
+            table[name] = np.rint(np.bincount(labels, weights=values, minlength=size)).astype(np.int64)
+        else:
+            table[name] = np.bincount(labels, weights=values, minlength=size)
+    return table
+
+# Bilan annuel par IRIS (paramètre irisYears) : une ligne par année et par IRIS où l'on a construit, écrit dans output/mesures_iris_annuelles.csv
+# Les IRIS absents d'une année n'y ont rien construit
+IRIS_YEAR = np.dtype([
+    ('year', '<u2'),
+    ('iris', '<u2'),
+    ('population_nouvelle', '<i8'),
+    ('surface_sol_construite', '<i8'),
+    ('surface_plancher_construite', '<i8'),
+    ('cellules_ouvertes', '<u4'),
+    ('cellules_densifiees', '<u4')
+])
+
+class IrisYears:
+    # size : nombre d'identifiants d'IRIS (nbIris + 1) ; rows : bilan déjà calculé (reprise)
+    def __init__(self, size, rows=None):
+        self.size = size
+        self.chunks = [] if rows is None else [np.array(rows, IRIS_YEAR)]
+
+    # Constructions de l'année avant leur ajout à l'état (urb vaut encore l'état du début d'année) ; vecteurs des cellules candidates
+    # Seules les cellules construites cette année sont lues ; la population suit le même calcul que Simulation.commit()
+    def add(self, year, irisId, tmpSrfSol, tmpSrfPla, urb, m2PlaHab):
+        touched = np.flatnonzero(tmpSrfPla)
+        srfPla = tmpSrfPla[touched]
+        m2 = m2PlaHab[touched]
+        sums = groupSums(irisId[touched], self.size, OrderedDict([
+            ('population_nouvelle', np.where(m2 != 0, (srfPla / m2).round(), 0).astype(np.uint16)),
+            ('surface_sol_construite', tmpSrfSol[touched]),
+            ('surface_plancher_construite', srfPla),
+            ('cellules_ouvertes', urb[touched] == 0),
+            ('cellules_densifiees', urb[touched] == 1)
+        ]))
+        ids = np.flatnonzero(sums['surface_plancher_construite'])
+        rows = np.zeros(len(ids), IRIS_YEAR)
+        rows['year'] = year
+        rows['iris'] = ids
+        for name, values in sums.items():
+            rows[name] = values[ids]
+        self.chunks.append(rows)
+
+    def toArray(self):
+        return np.concatenate(self.chunks) if self.chunks else np.zeros(0, IRIS_YEAR)
+
+    def save(self, path):
+        with Path(path).open('w') as w:
+            w.write('annee, iris, ' + ', '.join(IRIS_YEAR.names[2:]) + '\n')
+            for row in self.toArray().tolist():
+                w.write(', '.join(str(v) for v in row) + '\n')
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import sys
+import json
+import resource
+import numpy as np
+from time import time
+from pathlib import Path
+from ast import literal_eval
+from itertools import product
+from multiprocessing import Pool
+from collections import OrderedDict
+from simulation import Parameters, InputData, Simulation
+
+# Combinaisons mesurées par défaut ; chacune peut être remplacée par une liste dans la chaîne de paramètres
+grid = OrderedDict([
+    ('winSize', [3, 5]),
+    ('growth', [0.5, 1.5]),
+    ('scenario', ['tendanciel', 'reduction'])
+])
+
+# Métriques comparées à la référence : une hausse au-delà de la tolérance est une régression
+compared = ['seconds', 'peakRssMb']
+
+def combinations(grid, fixed):
+    keys = list(grid)
+    for values in product(*grid.values()):
+        params = OrderedDict(zip(keys, values))
+        params.update(fixed)
+        yield params
+
+# Mesure une configuration dans un processus neuf, pour que le pic de mémoire soit celui de cette seule configuration
+def benchRun(task):
+    dataDir, params, repeat = task
+    # Comme dans simulation.py, le réglage n'est pas hérité par les processus du pool
+    np.seterr(divide='ignore', invalid='ignore')
+    start = time()
+    data = InputData(dataDir)
+    load = time() - start
+    kwargs = dict(params)
+    growth = kwargs.pop('growth')
+    seconds = []
+    for r in range(repeat):
+        start = time()
+        sim = Simulation(Parameters(growth, **kwargs), data)
+        sim.run(progress=False)
+        seconds.append(time() - start)
+    # Nombre de cellules tirées (expansion et densification), identique d'une répétition à l'autre
+    draws = int(sim.heatMap.sum(dtype=np.int64))
+    best = min(seconds)
+    return OrderedDict([
+        ('params', params),
+        ('grid', '%ix%i' %(data.rows, data.cols)),
+        ('loadSeconds', round(load, 3)),
+        ('seconds', round(best, 3)),
+        ('allSeconds', [round(s, 3) for s in seconds]),
+        ('draws', draws),
+        ('drawsPerSec', round(draws / best) if best > 0 else None),
+        ('runsPerHour', round(3600 / best, 1) if best > 0 else None),
+        ('peakRssMb', round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1))
+    ])
+
+def runKey(run):
+    return json.dumps(run['params'], sort_keys=True)
+
+# Ajoute le rapport à la référence pour chaque configuration mesurée des deux côtés ; retourne la liste des régressions
+def compare(runs, baseline, tolerance):
+    reference = {runKey(run):run for run in baseline['runs']}
+    regressions = []
+    for run in runs:
+        ref = reference.get(runKey(run))
+        if ref is None or ref['grid'] != run['grid']:
+            continue
+        for metric in compared:
+            if ref[metric]:
+                ratio = run[metric] / ref[metric]
+                run[metric + 'Ratio'] = round(ratio, 3)
+                if ratio > 1 + tolerance:
+                    regressions.append(' '.join('%s=%s' %(k, v) for k, v in run['params'].items()) + ' : ' + metric + ' x' + str(round(ratio, 2)))
+    return regressions
+
+def describe(run):
+    line = ' '.join('%s=%s' %(k, v) for k, v in run['params'].items())
+    line += ' : %.2f s, %s draws/s, %s runs/h, %s MB' %(run['seconds'], run['drawsPerSec'], run['runsPerHour'], run['peakRssMb'])
+    ratios = [metric + ' x' + str(run[metric + 'Ratio']) for metric in compared if metric + 'Ratio' in run]
+    if ratios:
+        line += ' (' + ', '.join(ratios) + ')'
+    return line
+
+if __name__ == '__main__':
+    dataDir = Path(sys.argv[1])
+    output = Path(sys.argv[2])
+    repeat = 1
+    baseline = None
+    tolerance = 0.2
+    fixed = OrderedDict()
+    # Chaîne "clé=valeur" : listes pour winSize, growth et scenario, valeur fixe pour tout autre paramètre de simulate.py
+    if len(sys.argv) > 3:
+        for arg in sys.argv[3].split():
+            key, value = arg.split('=', 1)
+            try:
+                value = literal_eval(value)
+            except (ValueError, SyntaxError):
+                pass
+            if key == 'repeat':
+                repeat = int(value)
+            elif key == 'baseline':
+                baseline = Path(str(value))
+            elif key == 'tolerance':
+                tolerance = float(value)
+            elif key in grid:
+                grid[key] = value if isinstance(value, list) else [value]
+            elif key in Parameters.defaults:
+                fixed[key] = value
+            else:
+                print('Error : unknown parameter ' + key)
+                sys.exit()
+
+    tasks = [(dataDir, params, repeat) for params in combinations(grid, fixed)]
+    runs = []
+    with Pool(1, maxtasksperchild=1) as pool:
+        for run in pool.imap(benchRun, tasks):
+            runs.append(run)
+            print(describe(run))
+
+    regressions = []
+    if baseline:
+        with baseline.open('r') as r:
+            regressions = compare(runs, json.load(r), tolerance)
+        print('\nCompared with ' + str(baseline) + ' (tolerance ' + str(int(tolerance * 100)) + ' %) :')
+        for run in runs:
+            print(describe(run))
+    with output.open('w') as w:
+        json.dump(OrderedDict([('dataDir', str(dataDir)), ('repeat', repeat), ('runs', runs)]), w, indent=2)
+
+    if regressions:
+        print('\nRegressions :')
+        for r in regressions:
+            print('    ' + r)
+        sys.exit(1)
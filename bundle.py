@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import sys
+import json
+import struct
+import numpy as np
+from pathlib import Path
+from collections import OrderedDict
+
+# Fichier unique regroupant les données préparées : entête JSON suivi des rasters bruts, lisibles par projection mémoire sans décodage
+# Structure : MAGIC (8 octets), taille de l'entête (uint64 little-endian), entête JSON, puis chaque array aligné sur ALIGN octets
+MAGIC = b'DATABND1'
+ALIGN = 64
+
+def _padding(size):
+    return -size % ALIGN
+
+# Écrit un bundle à partir d'un dictionnaire d'arrays et d'attributs sérialisables en JSON
+def writeBundle(path, arrays, attributes):
+    arrays = OrderedDict((name, np.ascontiguousarray(a)) for name, a in arrays.items())
+    # Les positions dépendent de la taille de l'entête, qui dépend des positions : on réserve une taille fixe pour les nombres
+    entries = []
+    for name, a in arrays.items():
+        # Les types structurés (journal des constructions...) sont décrits champ par champ
+        dtype = a.dtype.descr if a.dtype.names else a.dtype.str
+        entries.append(OrderedDict([('name', name), ('dtype', dtype), ('shape', list(a.shape)), ('offset', 0)]))
+    header = OrderedDict([('attributes', attributes), ('arrays', entries)])
+    size = len(json.dumps(header).encode('utf-8')) + 20 * len(entries)
+    offset = 16 + size + _padding(16 + size)
+    for entry, a in zip(entries, arrays.values()):
+        entry['offset'] = offset
+        offset += a.nbytes + _padding(a.nbytes)
+    encoded = json.dumps(header).encode('utf-8')
+    encoded += b' ' * (size - len(encoded))
+
+    with Path(path).open('wb') as w:
+        w.write(MAGIC)
+        w.write(struct.pack('<Q', size))
+        w.write(encoded)
+        w.write(b'\0' * _padding(16 + size))
+        for a in arrays.values():
+            w.write(a.tobytes())
+            w.write(b'\0' * _padding(a.nbytes))
+
+# Lit un bundle ; retourne (attributs, arrays) où les arrays sont des vues en lecture seule sur le fichier projeté en mémoire
+def readBundle(path):
+    with Path(path).open('rb') as r:
+        if r.read(8) != MAGIC:
+            raise ValueError(str(path) + ' is not a data bundle')
+        size = struct.unpack('<Q', r.read(8))[0]
+        header = json.loads(r.read(size).decode('utf-8'), object_pairs_hook=OrderedDict)
+    raw = np.memmap(str(path), np.uint8, 'r')
+    arrays = OrderedDict()
+    for entry in header['arrays']:
+        dtype = entry['dtype']
+        dtype = np.dtype([tuple(field) for field in dtype] if isinstance(dtype, list) else dtype)
+        count = int(np.prod(entry['shape'])) * dtype.itemsize
+        block = raw[entry['offset']:entry['offset'] + count]
+        arrays[entry['name']] = np.asarray(block).view(dtype).reshape(entry['shape'])
+    return header['attributes'], arrays
+
+# (Re)crée le bundle d'un répertoire déjà préparé
+if __name__ == '__main__':
+    from simulation import InputData, BUNDLE
+    dataDir = Path(sys.argv[1])
+    InputData(dataDir, bundle=False).save(dataDir/BUNDLE)
+    print('Written ' + str(dataDir/BUNDLE))
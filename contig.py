@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import numpy as np
+
+# Somme des valeurs dans une fenêtre glissante de taille size en une passe grâce à une table de sommes cumulées
+# Fenêtre de size//2 cellules de part et d'autre (une de plus en bas et à droite si size est pair)
+# En bordure, la somme est faite sur la partie de la fenêtre comprise dans la grille
+def windowSum(array, size=3):
+    rows, cols = array.shape
+    lo, hi = -size//2 + 1, size//2
+    dtype = np.float64 if np.issubdtype(array.dtype, np.floating) else np.int64
+    table = np.zeros([rows + 1, cols + 1], dtype)
+    table[1:, 1:] = array.astype(dtype).cumsum(0).cumsum(1)
+    top = np.clip(np.arange(rows) + lo, 0, rows)
+    bottom = np.clip(np.arange(rows) + hi + 1, 0, rows)
+    left = np.clip(np.arange(cols) + lo, 0, cols)
+    right = np.clip(np.arange(cols) + hi + 1, 0, cols)
+    return table[np.ix_(bottom, right)] - table[np.ix_(top, right)] - table[np.ix_(bottom, left)] + table[np.ix_(top, left)]
+
+# Moyenne dans une fenêtre glissante, NaN en bordure quand la fenêtre sort de la grille
+def windowMean(array, size=3):
+    rows, cols = array.shape
+    h = size//2
+    output = np.full([rows, cols], np.nan, np.float32)
+    output[h:rows - h, h:cols - h] = (windowSum(array, size) / (size * size))[h:rows - h, h:cols - h]
+    return output
+
+# Nombre de cellules urbanisées dans le voisinage de chaque cellule, mis à jour à chaque urbanisation
+# Tient aussi à jour le masque des cellules qui respectent la règle minContig < contig <= maxContig
+class ContigCounter:
+    def __init__(self, urb, size, minContig, maxContig):
+        self.rows, self.cols = urb.shape
+        self.size = size
+        self.lo, self.hi = -size//2 + 1, size//2
+        self.area = size * size
+        self.minContig = minContig
+        self.maxContig = maxContig
+        # Les cellules dont la fenêtre sort de la grille ne sont jamais éligibles
+        h = size//2
+        self.inside = np.zeros([self.rows, self.cols], np.bool_)
+        self.inside[h:self.rows - h, h:self.cols - h] = True
+        self.count = windowSum((urb != 0).astype(np.uint16), size).astype(np.uint16)
+        self.eligible = self.rule(self.count) & self.inside
+
+    def rule(self, count):
+        contig = count / self.area
+        return (count > 0) & (self.minContig < contig) & (contig <= self.maxContig)
+
+    # A appeler quand la cellule (row, col) devient urbanisée ; retourne les index à plat des cellules dont l'éligibilité a changé
+    def add(self, row, col):
+        r0, r1 = max(row - self.hi, 0), min(row - self.lo + 1, self.rows)
+        c0, c1 = max(col - self.hi, 0), min(col - self.lo + 1, self.cols)
+        window = (slice(r0, r1), slice(c0, c1))
+        before = self.eligible[window].copy()
+        self.count[window] += 1
+        self.eligible[window] = self.rule(self.count[window]) & self.inside[window]
+        flips = np.nonzero(before != self.eligible[window])
+        return [(r0 + i) * self.cols + c0 + j for i, j in zip(*flips)]
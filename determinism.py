@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import sys
+import json
+import hashlib
+import numpy as np
+from pathlib import Path
+from ast import literal_eval
+from collections import OrderedDict
+from toolbox import printer
+from simulation import Parameters, InputData, Simulation
+
+# Jeu de configurations de référence : défauts, index creux, règle de contiguïté, autres scénarios et options de densification
+configs = [
+    OrderedDict([('growth', 1.2)]),
+    OrderedDict([('growth', 1.2), ('sparse', True)]),
+    OrderedDict([('growth', 0.8), ('scenario', 'reduction'), ('winSize', 5), ('contigFilter', True)]),
+    OrderedDict([('growth', 1.5), ('scenario', 'stable'), ('pluPriority', False), ('buildNonRes', False), ('forceEachYear', False), ('densifyOld', True)]),
+    OrderedDict([('growth', -1), ('exclusionRatio', 0.2), ('maxBuiltRatio', 60), ('sirene', 0), ('minContig', 0.2), ('maxContig', 0.6)])
+]
+
+# Empreinte d'un array : type, forme et contenu
+def hashArray(array):
+    array = np.ascontiguousarray(array)
+    h = hashlib.sha256()
+    h.update((array.dtype.str + str(array.shape)).encode('utf-8'))
+    h.update(array.tobytes())
+    return h.hexdigest()
+
+def value(v):
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return str(v)
+
+# Lance une configuration pour une graine ; retourne les empreintes des rasters de chaque année et de sortie, et les indicateurs
+def fingerprint(data, config, seed):
+    kwargs = OrderedDict(config)
+    growth = kwargs.pop('growth')
+    kwargs['seed'] = seed
+    sim = Simulation(Parameters(growth, **kwargs), data)
+    years = OrderedDict()
+
+    def onYear(sim, year):
+        years[str(year)] = OrderedDict((name, hashArray(array)) for name, array in sim.rasters().items())
+
+    sim.run(onYear=onYear, progress=False)
+    results = sim.results()
+    return OrderedDict([
+        ('config', config),
+        ('seed', seed),
+        ('outputs', OrderedDict((name, hashArray(array)) for name, (array, dtype) in results['outputs'].items())),
+        ('years', years),
+        ('mesures', OrderedDict((key, value(v)) for key, v in results['mesures'].items())),
+        ('consoOcs', OrderedDict((str(c), value(v)) for c, v in results['consoOcs'].items()))
+    ])
+
+def label(run):
+    return ' '.join('%s=%s' %(k, v) for k, v in run['config'].items()) + ' seed=' + str(run['seed'])
+
+def runAll(data, tasks):
+    runs = []
+    for n, (config, seed) in enumerate(tasks):
+        printer('Run %i/%i' %(n + 1, len(tasks)))
+        runs.append(fingerprint(data, config, seed))
+    print('')
+    return runs
+
+# Comparaison exacte, graine par graine ; retourne la liste des différences
+def compareExact(reference, runs):
+    differences = []
+    for ref, run in zip(reference, runs):
+        diff = [name for name in ref['outputs'] if run['outputs'].get(name) != ref['outputs'][name]]
+        diff += [key for key in ref['mesures'] if run['mesures'].get(key) != ref['mesures'][key]]
+        if run['consoOcs'] != ref['consoOcs']:
+            diff.append('conso_ocs')
+        if diff:
+            # Première année où l'état diverge, pour localiser le changement
+            first = next((year for year in ref['years'] if run['years'].get(year) != ref['years'][year]), None)
+            differences.append(label(ref) + ' : ' + ', '.join(diff) + ('' if first is None else ' (first divergent year ' + first + ')'))
+    return differences
+
+# Comparaison statistique sur les graines, pour une optimisation qui change l'ordre de consommation des nombres aléatoires
+# Pour chaque configuration et chaque indicateur numérique, l'écart des moyennes ne doit pas dépasser threshold écarts-types (test de Welch)
+def compareStats(reference, runs, threshold):
+    differences = []
+    report = []
+    groups = OrderedDict()
+    for ref, run in zip(reference, runs):
+        key = json.dumps(ref['config'])
+        groups.setdefault(key, []).append((ref, run))
+    for key, pairs in groups.items():
+        config = pairs[0][0]['config']
+        for indicator in pairs[0][0]['mesures']:
+            a = [ref['mesures'][indicator] for ref, run in pairs]
+            b = [run['mesures'].get(indicator) for ref, run in pairs]
+            if not all(isinstance(v, float) for v in a + b):
+                continue
+            a, b = np.array(a), np.array(b)
+            n = len(a)
+            error = np.sqrt(a.var(ddof=1) / n + b.var(ddof=1) / n) if n > 1 else 0
+            gap = abs(a.mean() - b.mean())
+            t = gap / error if error > 0 else (0 if gap == 0 else np.inf)
+            line = ' '.join('%s=%s' %(k, v) for k, v in config.items()) + ' : ' + indicator + ' %s -> %s (t=%.2f)' %(round(a.mean(), 3), round(b.mean(), 3), t)
+            report.append(line)
+            if t > threshold:
+                differences.append(line)
+    return differences, report
+
+if __name__ == '__main__':
+    mode = sys.argv[1]
+    dataDir = Path(sys.argv[2])
+    referenceFile = Path(sys.argv[3])
+    nbSeeds = 5
+    threshold = 3
+    if len(sys.argv) > 4:
+        for arg in sys.argv[4].split():
+            if 'seeds' in arg:
+                nbSeeds = int(arg.split('=')[1])
+            elif 'threshold' in arg:
+                threshold = float(arg.split('=')[1])
+            elif 'configs' in arg:
+                with Path(arg.split('=')[1]).open('r') as r:
+                    configs = [OrderedDict(literal_eval(l)) for l in r if l.strip()]
+
+    if mode not in ['record', 'check', 'stats']:
+        print('Error : mode should be record, check or stats')
+        sys.exit()
+
+    data = InputData(dataDir)
+    if mode == 'record':
+        tasks = [(config, seed) for config in configs for seed in range(nbSeeds)]
+        runs = runAll(data, tasks)
+        with referenceFile.open('w') as w:
+            json.dump(OrderedDict([('dataDir', str(dataDir)), ('runs', runs)]), w, indent=1)
+        print('Reference written: ' + str(len(runs)) + ' runs')
+    else:
+        with referenceFile.open('r') as r:
+            reference = json.load(r, object_pairs_hook=OrderedDict)['runs']
+        tasks = [(ref['config'], ref['seed']) for ref in reference]
+        runs = runAll(data, tasks)
+        if mode == 'check':
+            differences = compareExact(reference, runs)
+            print(str(len(runs) - len(differences)) + '/' + str(len(runs)) + ' runs identical to the reference')
+        else:
+            differences, report = compareStats(reference, runs, threshold)
+            for line in report:
+                print(line)
+            print(str(len(report) - len(differences)) + '/' + str(len(report)) + ' indicators equivalent (threshold t=' + str(threshold) + ')')
+        if differences:
+            print('\nDifferences :')
+            for d in differences:
+                print('    ' + d)
+            sys.exit(1)
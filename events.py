@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import os
+import sys
+import numpy as np
+from pathlib import Path
+from collections import OrderedDict
+
+# Journal des constructions d'une simulation (paramètre events) : une ligne par construction réussie, dans l'ordre de la simulation
+# Avec les données de départ, il suffit à reconstituer l'état de n'importe quelle année sans instantanés
+# Phases : ouverture d'une nouvelle cellule, construction au sol à côté du bâti existant, densification en hauteur
+EXPAND, GROUND, FLOORS = 0, 1, 2
+PHASES = ['expand', 'ground', 'floors']
+
+# srfSol et srfPla sont les surfaces effectivement ajoutées aux rasters (entières), people les personnes logées en plus dans la cellule
+EVENT = np.dtype([
+    ('year', '<u2'),
+    ('cell', '<u4'),
+    ('phase', 'u1'),
+    ('zau', 'u1'),
+    ('srfSol', '<u2'),
+    ('srfPla', '<u4'),
+    ('people', '<i4')
+])
+
+class EventLog:
+    def __init__(self, events=None):
+        self.rows = [] if events is None else [tuple(e) for e in events.tolist()]
+
+    # cell est l'index à plat dans la grille complète
+    def add(self, year, cell, phase, zau, srfSol, srfPla, people):
+        self.rows.append((year, cell, phase, zau, int(srfSol), int(srfPla), people))
+
+    def toArray(self):
+        return np.array(self.rows, EVENT)
+
+    def save(self, path):
+        np.save(str(path), self.toArray())
+
+# Rejoue le journal sur les rasters de départ ; génère (année, rasters) pour chaque année de years (toutes les années du journal par défaut)
+# Les rasters ont les mêmes noms et types que Simulation.rasters() et sont mis à jour en place d'une année à l'autre
+def replay(data, events, years=None):
+    if years is None:
+        years = np.unique(events['year']).tolist()
+    rasters = OrderedDict([
+        ('demographie', data.demographie.copy()),
+        ('urbanisation', np.where(data.srfSol > 0, 1, 0).astype(np.byte)),
+        ('surface_sol', data.srfSol.copy()),
+        ('surface_plancher', data.srfPla.copy())
+    ])
+    flat = OrderedDict((name, array.ravel()) for name, array in rasters.items())
+    # Le journal est dans l'ordre des années
+    bounds = np.searchsorted(events['year'], np.array(sorted(years)), side='right')
+    start = 0
+    for year, end in zip(sorted(years), bounds):
+        chunk = events[start:end]
+        cells = chunk['cell'].astype(np.intp)
+        flat['urbanisation'][cells] = 1
+        np.add.at(flat['surface_sol'], cells, chunk['srfSol'].astype(flat['surface_sol'].dtype))
+        np.add.at(flat['surface_plancher'], cells, chunk['srfPla'].astype(flat['surface_plancher'].dtype))
+        np.add.at(flat['demographie'], cells, chunk['people'].astype(flat['demographie'].dtype))
+        start = end
+        yield year, rasters
+
+# Reconstitue des instantanés à partir d'un journal, au format du répertoire snapshots de simulate.py (utilisable par tif_to_gif.py)
+if __name__ == '__main__':
+    from toolbox import to_tif
+    from contig import windowMean
+    from simulation import InputData
+    from simulate import snapPrefix, snapTypes
+    dataDir = Path(sys.argv[1])
+    events = np.load(sys.argv[2])
+    outDir = Path(sys.argv[3])
+    years = None
+    winSize = 3
+    if len(sys.argv) > 4:
+        for arg in sys.argv[4].split():
+            if 'years' in arg:
+                years = [int(y) for y in arg.split('=')[1].split(',')]
+            elif 'winSize' in arg:
+                winSize = int(arg.split('=')[1])
+
+    data = InputData(dataDir)
+    for name in snapTypes:
+        os.makedirs(str(outDir/name), exist_ok=True)
+    for year, rasters in replay(data, events, years):
+        rasters = OrderedDict(rasters)
+        rasters['contiguite'] = windowMean(rasters['urbanisation'], winSize)
+        for name, array in rasters.items():
+            to_tif(array, snapTypes[name], data.proj, data.geot, outDir/name/(snapPrefix[name] + '_' + str(year) + '.tif'))
+    print('Written ' + str(outDir))
@@ -14,7 +14,8 @@ from pathlib import Path
 from ast import literal_eval
 from time import strftime, time
 from shutil import rmtree, copyfile
-from toolbox import printer, getDone, getTime, to_array, to_tif
+from toolbox import printer, getDone, getTime, to_array, to_tif, tifProfiles, setTifProfile, gtiffOptions
+from simulation import InputData, BUNDLE
 
 # Chercher les chemins de QGIS sur Linux, Windows ou MacOS
 qgsRoot = None
@@ -125,6 +126,9 @@ if len(sys.argv) > 5:
         # Seuil de pente en % pour interdiction à la construction
         elif 'maxSlope' in arg:
             maxSlope = int(arg.split('=')[1])
+        # Profil de création des .tif (compression, tuilage...), voir toolbox.tifProfiles
+        elif 'tifProfile' in arg:
+            tifProfile = arg.split('=')[1]
 
 # Valeurs de paramètres par défaut
 if 'pixRes' not in globals():
@@ -154,6 +158,12 @@ if 'speed' not in globals():
     speed = False
 if 'truth' not in globals():
     truth = False
+if 'tifProfile' not in globals():
+    tifProfile = 'plain'
+if tifProfile not in tifProfiles:
+    print('tifProfile should be one of ' + ', '.join(tifProfiles))
+    sys.exit()
+setTifProfile(tifProfile)
 
 if dpt in ['11','30','34','48','66']:
     reg = 'R91'
@@ -301,6 +311,7 @@ def rasterize(vector, output, dtype, field=None, burn=None, inverse=False, touch
         allTouched=touch,
         outputBounds=(xMin, yMin, xMax, yMax),
         inverse=inverse,
+        creationOptions=gtiffOptions(tifProfile, dtype),
         options=['-ot', dtype, '-tr', str(pixRes), str(pixRes)]
     )
     gdal.Rasterize(str(output), str(vector), options=opt)
@@ -1909,6 +1920,9 @@ with (project/(strftime('%Y%m%d%H%M') + '_log.txt')).open('w') as log:
         copyfile(str(localData/'poids.csv'), str(project/'interet/poids.csv'))
         copyfile(str(workspace/'data'/pixResStr/'evo_surface_sol.csv'), str(project/'evo_surface_sol.csv'))
 
+        # Bundle unique des données préparées, lu directement par simulate.py
+        InputData(project, bundle=False).save(project/BUNDLE)
+
         print('\nFinished at ' + strftime('%H:%M:%S'))
         log.write(getTime(start_time) + '\n')
         if truth:
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import json
+from time import perf_counter
+from pathlib import Path
+from collections import OrderedDict
+
+# Mesure du temps passé dans chaque étape d'une simulation et comptage des tirages, par année et au total
+# Les méthodes mesurées sont remplacées sur l'instance seulement : une simulation sans profil n'a aucun surcoût de chronométrage
+# Les temps sont inclusifs (urbanize contient chooseCell, expand, build et reshape)
+class Profiler:
+    # Méthodes de Simulation mesurées
+    methods = ['step', 'urbanize', 'chooseCell', 'expand', 'build', 'reshape', 'results']
+
+    def __init__(self):
+        self.year = None
+        self.seconds = OrderedDict()
+        self.calls = OrderedDict()
+        self.counters = OrderedDict()
+        self.years = OrderedDict()
+
+    # Remplace les méthodes de la simulation par des versions chronométrées
+    def attach(self, sim):
+        for name in self.methods:
+            setattr(sim, name, self.timed(name, getattr(sim, name)))
+
+    def timed(self, name, method):
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.add(name, perf_counter() - start)
+        return wrapper
+
+    def yearStats(self):
+        if self.year not in self.years:
+            self.years[self.year] = OrderedDict([('seconds', OrderedDict()), ('counters', OrderedDict())])
+        return self.years[self.year]
+
+    # Ajoute une durée à une étape, pour l'année en cours si elle est connue
+    def add(self, name, seconds):
+        self.seconds[name] = self.seconds.get(name, 0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self.year is not None:
+            stats = self.yearStats()['seconds']
+            stats[name] = stats.get(name, 0) + seconds
+
+    # Ajoute des compteurs (dictionnaire nom: valeur) au total et à l'année en cours
+    def count(self, counters):
+        stats = self.yearStats()['counters'] if self.year is not None else None
+        for name, value in counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+            if stats is not None:
+                stats[name] = stats.get(name, 0) + value
+
+    def toDict(self):
+        phases = OrderedDict()
+        for name in self.seconds:
+            phases[name] = OrderedDict([('seconds', round(self.seconds[name], 6)), ('calls', self.calls[name])])
+        years = OrderedDict()
+        for year, stats in self.years.items():
+            years[str(year)] = OrderedDict([
+                ('seconds', OrderedDict((k, round(v, 6)) for k, v in stats['seconds'].items())),
+                ('counters', stats['counters'])
+            ])
+        return OrderedDict([('phases', phases), ('counters', self.counters), ('years', years)])
+
+    def save(self, path):
+        with Path(path).open('w') as w:
+            json.dump(self.toDict(), w, indent=2)
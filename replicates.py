@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import numpy as np
+from collections import OrderedDict
+
+# Graines des réplicats, dérivées d'une seule SeedSequence : chaque réplicat reste une simulation ordinaire
+# qui peut être relancée seule avec simulate.py et seed=<graine>
+def replicateSeeds(seed, count):
+    return [int(s) for s in np.random.SeedSequence(seed).generate_state(count, np.uint32)]
+
+# Moyenne et variance d'un raster mises à jour à chaque réplicat (algorithme de Welford), sans garder les réplicats en mémoire
+class RunningStats:
+    def __init__(self, shape):
+        self.count = 0
+        self.mean = np.zeros(shape, np.float64)
+        self.m2 = np.zeros(shape, np.float64)
+
+    def add(self, array):
+        self.count += 1
+        delta = array - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (array - self.mean)
+
+    # Variance empirique (n - 1), nulle avec un seul réplicat
+    def variance(self):
+        if self.count < 2:
+            return np.zeros_like(self.m2)
+        return self.m2 / (self.count - 1)
+
+# Agrégats d'une série de réplicats : moyenne et variance des rasters suivis, probabilité d'urbanisation par cellule,
+# distribution des indicateurs de mesures.csv et consommation moyenne par classe d'occupation du sol
+class Replicates:
+    # Rasters suivis : nom du raster agrégé, nom de la sortie de Simulation.results() ({} est l'année finale)
+    rasters = OrderedDict([
+        ('urbanisation', 'urbanisation_{}.tif'),
+        ('surface_sol_construite', 'surface_sol_construite.tif'),
+        ('population_nouvelle', 'population_nouvelle.tif'),
+        ('choices_heatmap', 'choices_heatmap.tif')
+    ])
+    quantiles = OrderedDict([('min', 0), ('q05', 0.05), ('mediane', 0.5), ('q95', 0.95), ('max', 1)])
+
+    def __init__(self, rows, cols, finalYear):
+        self.finalYear = finalYear
+        self.count = 0
+        self.stats = OrderedDict((name, RunningStats([rows, cols])) for name in self.rasters)
+        # Nombre de réplicats où la cellule est ouverte à l'urbanisation
+        self.expansion = np.zeros([rows, cols], np.uint32)
+        self.seeds = []
+        self.mesures = []
+        self.consoOcs = OrderedDict()
+
+    # Ajoute les résultats d'un réplicat (dictionnaire retourné par Simulation.replicateResults() ou results())
+    def add(self, seed, results):
+        self.count += 1
+        outputs = results['outputs']
+        for name, stats in self.stats.items():
+            stats.add(outputs[self.rasters[name].format(self.finalYear)][0])
+        self.expansion += outputs['expansion.tif'][0].astype(np.uint32)
+        self.seeds.append(seed)
+        self.mesures.append(results['mesures'])
+        for c, surface in results['consoOcs'].items():
+            self.consoOcs[c] = self.consoOcs.get(c, 0) + surface
+
+    # Rasters agrégés, au format des sorties de Simulation.results()
+    def outputs(self):
+        outputs = OrderedDict()
+        for name, stats in self.stats.items():
+            outputs[name + '_moyenne.tif'] = (stats.mean.astype(np.float32), 'float32')
+            outputs[name + '_variance.tif'] = (stats.variance().astype(np.float32), 'float32')
+        outputs['probabilite_urbanisation.tif'] = ((self.expansion / max(self.count, 1)).astype(np.float32), 'float32')
+        return outputs
+
+    # Distribution de chaque indicateur sur les réplicats ; les valeurs non numériques ('NA') sont ignorées
+    def summary(self):
+        summary = OrderedDict()
+        for key in self.mesures[0] if self.mesures else []:
+            values = []
+            for mesures in self.mesures:
+                try:
+                    values.append(float(mesures[key]))
+                except (TypeError, ValueError):
+                    pass
+            values = np.array(values)
+            stats = OrderedDict([('n', values.size)])
+            if values.size:
+                stats['moyenne'] = values.mean()
+                stats['ecart_type'] = values.std(ddof=1) if values.size > 1 else 0.0
+                for name, q in self.quantiles.items():
+                    stats[name] = np.quantile(values, q)
+            summary[key] = stats
+        return summary
+
+    def meanConsoOcs(self):
+        return OrderedDict((c, surface / self.count) for c, surface in self.consoOcs.items())
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import numpy as np
+from bisect import bisect_right
+
+# Les flux aléatoires utilisent numpy.random.Generator, PCG64 et SeedSequence, apparus avec numpy 1.17
+if not hasattr(np.random, 'SeedSequence'):
+    raise ImportError('numpy >= 1.17 is required (numpy.random.Generator and SeedSequence), found numpy ' + np.__version__)
+
+# Arbres de sommes des lignes de weights (k x N) : feuilles à partir de l'index leaves, racine à l'index 1
+def buildTrees(weights):
+    size = weights.shape[1]
+    leaves = 1
+    while leaves < size:
+        leaves *= 2
+    trees = np.zeros([weights.shape[0], 2 * leaves], np.float64)
+    trees[:, leaves:leaves + size] = np.where(weights > 0, weights, 0)
+    # Chaque noeud interne est la somme exacte de ses deux enfants
+    n = leaves
+    while n > 1:
+        trees[:, n//2:n] = trees[:, n:2*n:2] + trees[:, n+1:2*n:2]
+        n //= 2
+    return leaves, trees
+
+# Arbre de sommes (segment tree) pour le tirage pondéré dynamique parmi les cellules d'une grille
+# Tirage, mise à zéro et changement de poids en O(log N) au lieu de renormaliser toute la grille
+class WeightedSampler:
+    def __init__(self, weights):
+        flat = np.asarray(weights, np.float64).ravel()
+        self.size = flat.size
+        self.leaves, trees = buildTrees(flat[None])
+        self.tree = trees[0]
+
+    # Un arbre par ligne de weights (un par réplicat), construits ensemble ; chacun est identique à WeightedSampler(ligne)
+    @classmethod
+    def stack(cls, weights):
+        weights = np.asarray(weights, np.float64)
+        weights = weights.reshape(weights.shape[0], -1)
+        leaves, trees = buildTrees(weights)
+        samplers = []
+        for tree in trees:
+            sampler = cls.__new__(cls)
+            sampler.size, sampler.leaves, sampler.tree = weights.shape[1], leaves, tree
+            samplers.append(sampler)
+        return samplers
+
+    # Somme des poids restants (exactement 0 quand toutes les feuilles sont nulles)
+    def total(self):
+        return self.tree[1]
+
+    # Modifie le poids de l'index i (0 pour qu'il ne soit plus tiré)
+    def update(self, i, w):
+        tree = self.tree
+        p = i + self.leaves
+        tree[p] = w if w > 0 else 0
+        p //= 2
+        while p > 0:
+            tree[p] = tree[2*p] + tree[2*p + 1]
+            p //= 2
+
+    # Retourne le premier index dont la somme cumulée dépasse u * total (équivalent à np.random.choice)
+    def draw(self, u):
+        tree = self.tree
+        target = u * tree[1]
+        p = 1
+        while p < self.leaves:
+            left = tree[2*p]
+            # Si l'arrondi nous emmène vers une branche vide, on reste à gauche
+            if target < left or tree[2*p + 1] <= 0:
+                p = 2*p
+            else:
+                target -= left
+                p = 2*p + 1
+        return p - self.leaves
+
+# Flux de nombres uniformes dans [0, 1) pré-générés par blocs à partir d'un numpy.random.Generator
+# La suite produite ne dépend pas de la taille des blocs
+class UniformStream:
+    def __init__(self, seedSeq, blockSize=4096):
+        self.generator = np.random.Generator(np.random.PCG64(seedSeq))
+        self.blockSize = blockSize
+        self.block = []
+        self.pos = 0
+        # État du générateur avant le bloc en cours, pour pouvoir le régénérer à la reprise
+        self.blockState = None
+
+    def __call__(self):
+        if self.pos == len(self.block):
+            self.blockState = self.generator.bit_generator.state
+            self.block = self.generator.random(self.blockSize).tolist()
+            self.pos = 0
+        u = self.block[self.pos]
+        self.pos += 1
+        return u
+
+    # État sérialisable en JSON : le bloc en cours n'est pas stocké mais régénéré à partir de l'état qui l'a produit
+    def getState(self):
+        if self.blockState is None:
+            return {'generator': self.generator.bit_generator.state, 'size': 0, 'pos': 0}
+        return {'generator': self.blockState, 'size': len(self.block), 'pos': self.pos}
+
+    def setState(self, state):
+        self.generator.bit_generator.state = state['generator']
+        self.blockState = None
+        self.block = []
+        if state['size'] > 0:
+            self.blockState = self.generator.bit_generator.state
+            self.block = self.generator.random(state['size']).tolist()
+        self.pos = state['pos']
+
+# Flux indépendants et reproductibles pour chaque composante aléatoire de la simulation, dérivés d'une seule graine
+# Changer le nombre de tirages d'une composante ne décale pas la suite des autres
+class SimulationRng:
+    def __init__(self, seed, blockSize=4096):
+        cells, surfaces, floors = np.random.SeedSequence(seed).spawn(3)
+        self.cells = UniformStream(cells, blockSize)
+        self.surfaces = UniformStream(surfaces, blockSize)
+        self.floors = UniformStream(floors, blockSize)
+
+    def getState(self):
+        return {'cells': self.cells.getState(), 'surfaces': self.surfaces.getState(), 'floors': self.floors.getState()}
+
+    def setState(self, state):
+        self.cells.setState(state['cells'])
+        self.surfaces.setState(state['surfaces'])
+        self.floors.setState(state['floors'])
+
+# Tables de tirage pré-calculées par IRIS à partir des dictionnaires de parseDistrib(), indexées par la valeur de irisId
+# Le repli sur la distribution non ajustée (noFit) est résolu au chargement ; un tirage par recherche dans la fonction de répartition, comme np.random.choice
+class DistribTable:
+    def __init__(self, fit, noFit):
+        size = max(list(fit.keys()) + list(noFit.keys()) + [0]) + 1
+        self.values = [None] * size
+        self.cdf = [None] * size
+        # Valeur maximale de la distribution ajustée (même pondérée à 0), utilisée pour la densification
+        self.maxFit = [0] * size
+        for id in range(size):
+            for poids in (fit.get(id, {}), noFit.get(id, {})):
+                values = np.array(list(poids.keys()))
+                pds = np.array(list(poids.values()))
+                if len(values) > 0 and sum(pds) > 0:
+                    cdf = (pds / pds.sum()).cumsum()
+                    cdf /= cdf[-1]
+                    self.values[id] = values
+                    self.cdf[id] = cdf.tolist()
+                    break
+            if len(fit.get(id, {})) > 0:
+                self.maxFit[id] = int(max(fit[id].keys()))
+
+    # Tire une valeur pour l'IRIS id ; random n'est appelé que si une distribution existe, sinon on retourne None
+    def draw(self, id, random):
+        cdf = self.cdf[id]
+        if cdf is None:
+            return None
+        return self.values[id][bisect_right(cdf, random())]
@@ -0,0 +1,1034 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import csv
+import copy
+import gdal
+import numpy as np
+from time import time
+from pathlib import Path
+from collections import OrderedDict
+from toolbox import printer, to_array, tifProfiles
+from bundle import readBundle, writeBundle
+from contig import ContigCounter, windowMean
+from profiling import Profiler
+from events import EventLog, EXPAND, GROUND, FLOORS
+from aggregate import labelRaster, groupSums, IrisYears
+from sampling import WeightedSampler, DistribTable, SimulationRng
+
+# Ignorer les erreurs de numpy lors d'une division par 0
+np.seterr(divide='ignore', invalid='ignore')
+
+# Lecture d'un CSV de distribution (surfaces ou étages) en dictionnaire {iris: {valeur: poids}}
+def parseDistrib(file, nbIris, type=None, fit=True):
+    poids = {}
+    for i in range(nbIris):
+        poids[i+1] = {}
+    file.readline()
+    for l in file.readlines():
+        values = l.split(',')
+        if fit:
+            if type == 'floors':
+                id = int(values[1].replace('"',''))
+                etages = int(values[2].replace('"',''))
+                # AIC=[4] ; Chi²=[5]
+                poids[id][etages] = float(values[5].replace('\n','')) if 'NA' not in values[5] else 0
+            elif type == 'surf':
+                id = int(values[6].replace('"','').replace('\n',''))
+                surf = float(values[1])
+                # AD=[2] ; CVM=[3] ; KS=[4] ; AIC=[5] ;
+                poids[id][surf] = float(values[4])
+        else:
+            id = int(values[0])
+            dist = int(values[1])
+            poids[id][dist] = float(values[3])
+    return poids
+
+# Valeur numpy ou python en nombre python, pour l'écriture en JSON
+def toScalar(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+# Paramètres d'une simulation ; growth est obligatoire, les autres ont une valeur par défaut
+class Parameters:
+    # Dans l'ordre utilisé pour les sorties tabulaires
+    defaults = OrderedDict([
+        ('scenario', 'tendanciel'),
+        ('pluPriority', True),
+        ('buildNonRes', True),
+        ('exclusionRatio', 0.5),
+        ('maxBuiltRatio', 80),
+        ('forceEachYear', True),
+        ('densifyOld', False),
+        ('winSize', 3),
+        ('minContig', 0.1),
+        ('maxContig', 0.8),
+        ('contigFilter', False),
+        ('sirene', 1),
+        ('transport', 1),
+        ('routes', 1),
+        ('ecologie', 1),
+        ('seed', 42),
+        ('replicates', 1),
+        ('batchSize', 1),
+        ('maxUsedSrfPla', 200),
+        ('finalYear', 2040),
+        ('sparse', False),
+        ('tiffs', False),
+        ('snaps', False),
+        ('snapStack', False),
+        ('tifProfile', 'plain'),
+        ('checkpoints', ''),
+        ('resume', ''),
+        ('verbose', False),
+        ('profile', False),
+        ('events', False),
+        ('irisYears', False),
+        ('metricsOnly', False),
+        ('store', '')
+    ])
+
+    def __init__(self, growth, **kwargs):
+        self.growth = float(growth)
+        for key, value in self.defaults.items():
+            setattr(self, key, value)
+        for key, value in kwargs.items():
+            if key not in self.defaults:
+                raise ValueError('unknown parameter ' + key)
+            setattr(self, key, value)
+        self.check()
+
+    # Contrôle de la validité des paramètres
+    def check(self):
+        if self.scenario not in ['tendanciel', 'stable', 'reduction']:
+            raise ValueError('scenario value must be tendanciel, stable or reduction.')
+        if self.growth > 2:
+            raise ValueError('maximum evolution rate fixed at: 2 %')
+        if self.maxContig > 1 or self.minContig > 1:
+            raise ValueError('minContig and maxContig should be float numbers < 1 !')
+        if self.minContig > self.maxContig:
+            raise ValueError('maxContig should be higher than minContig !')
+        if self.replicates < 1:
+            raise ValueError('replicates should be at least 1')
+        if self.batchSize < 1:
+            raise ValueError('batchSize should be at least 1')
+        if self.tifProfile not in tifProfiles:
+            raise ValueError('tifProfile should be one of ' + ', '.join(tifProfiles))
+        if self.metricsOnly and (self.tiffs or self.snaps or self.profile or self.events or self.irisYears or self.checkpoints):
+            raise ValueError('metricsOnly writes no file besides the indicators : tiffs, snaps, profile, events, irisYears and checkpoints are not available')
+        if self.metricsOnly and self.replicates > 1:
+            raise ValueError('metricsOnly is not available with replicates, which write aggregated rasters')
+        if (self.replicates > 1 or self.batchSize > 1) and (self.events or self.irisYears or self.checkpoints or self.resume or self.snaps or self.snapStack or self.profile):
+            raise ValueError('replicates and batchSize only write aggregated outputs : events, irisYears, checkpoints, resume, snaps, snapStack and profile are not available')
+        try:
+            years = self.checkpointYears()
+        except ValueError:
+            raise ValueError('checkpoints should be a comma-separated list of years')
+        if any(year < 2015 or year > self.finalYear for year in years):
+            raise ValueError('checkpoint years should be between 2015 and finalYear')
+
+    # Années des points de reprise, checkpoints="2025,2030"
+    def checkpointYears(self):
+        return [int(year) for year in str(self.checkpoints).split(',') if year.strip()]
+
+    def items(self):
+        values = OrderedDict([('growth', self.growth)])
+        for key in self.defaults:
+            values[key] = getattr(self, key)
+        return values
+
+    # Nom du répertoire de sortie, qui résume les paramètres
+    def projectName(self, pixSize):
+        projectStr = '%im_tx%s_%s_winSize%i_minContig%s_maxContig%s_maxBuiltRatio%i_exclusionRatio%s'%(pixSize, str(self.growth), self.scenario, self.winSize, str(self.minContig), str(self.maxContig), self.maxBuiltRatio, str(self.exclusionRatio))
+        if self.pluPriority:
+            projectStr += '_pluPrio'
+        if self.buildNonRes:
+            projectStr += '_buildNonRes'
+        if self.forceEachYear:
+            projectStr += '_forceEachYear'
+        if self.densifyOld:
+            projectStr += '_densifyOld'
+        if self.contigFilter:
+            projectStr += '_contigFilter'
+        if self.finalYear != 2040:
+            projectStr += '_' + str(self.finalYear)
+        return projectStr
+
+# Nom du bundle écrit par prepare.py dans le répertoire des données préparées
+BUNDLE = 'donnees.bundle'
+
+# Données préparées par prepare.py, chargées une seule fois ; elles ne sont jamais modifiées par les simulations
+# dataDir est soit le répertoire préparé, soit directement un bundle ; si le répertoire contient un bundle, il est lu à la place des fichiers
+class InputData:
+    # Rasters d'entrée, dans l'ordre du bundle (pluPrio et pluRest sont None sans PLU)
+    arrays = ['irisId', 'restriction', 'pluPrio', 'pluRest', 'demographie', 'srfSol', 'srfSolRes', 'srfPla',
+              'm2PlaHab', 'txSsr', 'eco', 'rou', 'tra', 'sir', 'ocs', 'ocsLabels']
+    # Distributions des étages et surfaces par IRIS, telles que lues par parseDistrib()
+    distribs = ['poidsEtages', 'poidsSurfaces', 'poidsEtagesNoFit', 'poidsSurfacesNoFit']
+
+    def __init__(self, dataDir, bundle=True):
+        dataDir = Path(dataDir)
+        self.dataDir = dataDir
+        self.bundle = None
+        if bundle and dataDir.is_file():
+            self.bundle = dataDir
+        elif bundle and (dataDir/BUNDLE).exists():
+            self.bundle = dataDir/BUNDLE
+        if self.bundle:
+            self.loadBundle(self.bundle)
+        else:
+            self.loadDirectory(dataDir)
+
+        self.rows, self.cols = self.irisId.shape
+        self.pixSize = int(self.geot[1])
+        self.srfCell = self.pixSize * self.pixSize
+        self.nbIris = int(self.irisId.max())
+        # Tables de tirage des étages et surfaces par IRIS, construites une seule fois
+        self.tableEtages = DistribTable(self.poidsEtages, self.poidsEtagesNoFit)
+        self.tableSurfaces = DistribTable(self.poidsSurfaces, self.poidsSurfacesNoFit)
+
+    # Lecture des fichiers GeoTIFF et CSV du répertoire préparé
+    def loadDirectory(self, dataDir):
+        # Création des variables GDAL pour écriture de raster, indispensables pour la fonction to_tif()
+        ds = gdal.Open(str(dataDir/'iris_id.tif'))
+        self.irisId = ds.GetRasterBand(1).ReadAsArray().astype(np.uint8)
+        self.proj = ds.GetProjection()
+        self.geot = ds.GetGeoTransform()
+        nbIris = int(self.irisId.max())
+        ds = None
+
+        # Population et surfaces au sol historiques
+        with (dataDir/'population.csv').open('r') as csvFile:
+            reader = csv.reader(csvFile)
+            next(reader, None)
+            self.histPop = {rows[0]:rows[1] for rows in reader}
+        with (dataDir/'evo_surface_sol.csv').open('r') as r:
+            reader = csv.reader(r)
+            next(reader, None)
+            self.dicSsol = {rows[0]:int(rows[1]) for rows in reader}
+
+        with (dataDir/'poids_etages.csv').open('r') as r:
+            self.poidsEtages = parseDistrib(r, nbIris, 'floors')
+        with (dataDir/'poids_surfaces.csv').open('r') as r:
+            self.poidsSurfaces = parseDistrib(r, nbIris, 'surf')
+        with (dataDir/'poids_etages_nofit.csv').open('r') as r:
+            self.poidsEtagesNoFit = parseDistrib(r, nbIris, fit=False)
+        with (dataDir/'poids_surfaces_nofit.csv').open('r') as r:
+            self.poidsSurfacesNoFit = parseDistrib(r, nbIris, fit=False)
+
+        # Restrictions et PLU
+        self.restriction = to_array(dataDir/'interet/restriction_totale.tif')
+        self.pluPrio = None
+        self.pluRest = None
+        if (dataDir/'interet/plu_restriction.tif').exists() and (dataDir/'interet/plu_priorite.tif').exists():
+            self.pluPrio = to_array(dataDir/'interet/plu_priorite.tif')
+            self.pluRest = to_array(dataDir/'interet/plu_restriction.tif')
+
+        self.demographie = to_array(dataDir/'demographie.tif', np.uint16)
+        self.srfSol = to_array(dataDir/'srf_sol.tif', np.uint16)
+        self.srfSolRes = to_array(dataDir/'srf_sol_res.tif', np.uint16)
+        self.srfPla = to_array(dataDir/'srf_pla.tif', np.uint16)
+        self.m2PlaHab = to_array(dataDir/'iris_m2_hab.tif', np.uint16)
+        self.txSsr = to_array(dataDir/'iris_tx_ssr.tif', np.float32)
+        # Amenités
+        self.eco = to_array(dataDir/'interet/non-importance_ecologique.tif', np.float32)
+        self.rou = to_array(dataDir/'interet/proximite_routes.tif', np.float32)
+        self.tra = to_array(dataDir/'interet/proximite_transport.tif', np.float32)
+        self.sir = to_array(dataDir/'interet/densite_sirene.tif', np.float32)
+        # Occupation du sol pour le bilan de consommation
+        self.ocs = to_array(dataDir/'classes_ocsol.tif', np.float32)
+        # Étiquettes des classes pour les sommes groupées des résultats (aggregate.py), gardées dans le bundle avec les codes des classes
+        self.ocsClasses, self.ocsLabels = labelRaster(self.ocs)
+
+    # Lecture d'un bundle : les rasters sont des vues en lecture seule sur le fichier, déjà dans leur type final
+    def loadBundle(self, path):
+        attributes, arrays = readBundle(path)
+        self.proj = attributes['proj']
+        self.geot = tuple(attributes['geot'])
+        self.histPop = attributes['histPop']
+        self.dicSsol = attributes['dicSsol']
+        # Les distributions sont stockées en listes [iris, valeur, poids] pour garder l'ordre des valeurs
+        for name in self.distribs:
+            poids = {}
+            for id, value, weight in attributes[name]:
+                poids.setdefault(id, {})[value] = weight
+            for id in range(1, attributes['nbIris'] + 1):
+                poids.setdefault(id, {})
+            setattr(self, name, poids)
+        for name in self.arrays:
+            setattr(self, name, arrays.get(name))
+        # Bundle écrit avant l'ajout des étiquettes d'occupation du sol : elles sont recalculées à chaque chargement (relancer bundle.py)
+        if self.ocsLabels is None:
+            self.ocsClasses, self.ocsLabels = labelRaster(self.ocs)
+        else:
+            self.ocsClasses = np.array(attributes['ocsClasses'], np.float32)
+
+    # Écrit toutes les données dans un seul bundle, lisible par InputData(path)
+    def save(self, path):
+        attributes = OrderedDict([
+            ('proj', self.proj),
+            ('geot', list(self.geot)),
+            ('nbIris', self.nbIris),
+            ('histPop', self.histPop),
+            ('dicSsol', self.dicSsol),
+            ('ocsClasses', self.ocsClasses.tolist())
+        ])
+        for name in self.distribs:
+            poids = getattr(self, name)
+            attributes[name] = [[id, value, weight] for id in poids for value, weight in poids[id].items()]
+        arrays = OrderedDict((name, getattr(self, name)) for name in self.arrays if getattr(self, name) is not None)
+        writeBundle(path, arrays, attributes)
+
+# Une simulation de 2015 à finalYear ; l'état est porté par des vecteurs sur les cellules candidates
+class Simulation:
+    # Vecteurs de l'état modifiés au cours de la simulation
+    state = ['urb', 'srfSol', 'srfPla', 'srfSolRes', 'demographie', 'capaSol']
+
+    def __init__(self, params, data):
+        p = params
+        self.params = p
+        self.data = data
+        self.rows, self.cols = data.rows, data.cols
+        self.verbose = p.verbose
+        rows, cols = self.rows, self.cols
+
+        # Création des dictionnaires contenant la population par année
+        pop09 = int(data.histPop['2009'])
+        pop14 = int(data.histPop['2014'])
+        evoPop = (pop14 - pop09) / pop09 / 5
+        growth = p.growth
+        if growth == -1.0:
+            growth = evoPop * 100
+        self.growth = growth
+
+        self.popDic = {}
+        year = 2015
+        pop = pop14
+        while year <= p.finalYear:
+            self.popDic[year] = round(pop * (growth / 100))
+            pop += round(pop * (growth / 100))
+            year += 1
+        self.sumPopALoger = sum(self.popDic.values())
+
+        # Statistiques sur l'évolution du bâti
+        self.m2SolHab09 = data.dicSsol['2009'] / pop09
+        self.m2SolHab14 = data.dicSsol['2014'] / pop14
+        self.m2SolHabEvo = (self.m2SolHab14 - self.m2SolHab09) / self.m2SolHab09 / 5
+
+        # Création du dictionnaire pour nombre de m2 ouverts à l'urbanisation par année, selon le scénario
+        self.dicSrf = {}
+        year = 2015
+        m2SolHab14 = self.m2SolHab14
+        if p.scenario == 'tendanciel':
+            srfMax = m2SolHab14
+            while year <= p.finalYear :
+                srfMax += srfMax * self.m2SolHabEvo
+                self.dicSrf[year] = int(round(srfMax) * self.popDic[year])
+                year += 1
+        elif p.scenario == 'stable':
+            srfMax = m2SolHab14
+            while year <= p.finalYear :
+                self.dicSrf[year] = int(round(srfMax) * self.popDic[year])
+                year += 1
+        elif p.scenario == 'reduction':
+            srfMax = m2SolHab14
+            totalYears = p.finalYear - year
+            while year <= p.finalYear :
+                self.dicSrf[year] = int(round(srfMax) * self.popDic[year])
+                srfMax -= m2SolHab14 * (0.75 / totalYears)
+                year += 1
+        self.srfMax = srfMax
+        if self.verbose:
+            print(("\nPopulation to put up until " + str(p.finalYear) + " : " + str(self.sumPopALoger)))
+            print(('Computed threshold for area consumption per person: ' + str(int(round(srfMax))) + ' m2'))
+
+        poids = OrderedDict()
+        poids["sirene"] = p.sirene
+        poids["transport"] = p.transport
+        poids["routes"] = p.routes
+        poids["ecologie"] = p.ecologie
+        sommePoids = sum(poids.values())
+        if sommePoids == 0:
+            sommePoids = 1
+        self.coef = OrderedDict()
+        for key in poids:
+            self.coef[key] = poids[key] / sommePoids
+        coef = self.coef
+
+        # Préparation des restrictions et gestion du PLU
+        restriction = data.restriction
+        self.pluPriority = p.pluPriority
+        if data.pluRest is not None:
+            self.skipZau = not p.pluPriority
+            restriction = np.where(data.pluRest == 1, 1, restriction)
+        else:
+            self.skipZau = True
+            self.pluPriority = False
+
+        self.heatMap = np.zeros([rows, cols], np.uint16)
+        self.demographie14 = data.demographie
+        self.srfSol14 = data.srfSol
+        self.srfPla14 = data.srfPla
+        m2PlaHab = np.where(data.m2PlaHab > p.maxUsedSrfPla, p.maxUsedSrfPla, data.m2PlaHab)
+        # Création du raster final d'intérêt avec pondération
+        interet = np.where((restriction != 1), (data.eco * coef['ecologie']) + (data.rou * coef['routes']) + (data.tra * coef['transport']) + (data.sir * coef['sirene']), 0)
+        maxInterest =  np.amax(interet)
+        if maxInterest == 0 :
+            maxInterest = 1
+        interet = (interet /maxInterest).astype(np.float32)
+
+        # Création des rasters de capacité en surfaces sol et plancher
+        srfCell = data.srfCell
+        capaSol = np.zeros([rows, cols], np.uint16) + srfCell * p.maxBuiltRatio / 100
+        capaSol = np.where((restriction != 1) & (self.srfSol14 < capaSol), capaSol - self.srfSol14, 0).astype(np.uint16)
+        self.totalCapacity = int(np.where(capaSol > 0, 1, 0).sum())
+        # Cellules urbanisées (tout bâti inclu)
+        self.urb14 = np.where(self.srfSol14 > 0, 1, 0).astype(np.byte)
+        txArtif = (self.srfSol14 / srfCell).astype(np.float32)
+        # On filtre les cellules d'intéret pour limiter les tirages inutiles
+        interet = np.where(m2PlaHab > 0, interet, 0)
+        # Situation à t0 écrite avec tiffs, copiée avant que la simulation ne modifie la capacité au sol
+        self.initial = None
+        if p.tiffs:
+            self.initial = OrderedDict([
+                ('urbanisation.tif', (self.urb14, 'byte')),
+                ('capacite_sol.tif', (capaSol.copy(), 'uint16')),
+                ('taux_artif.tif', (txArtif, 'float32')),
+                ('interet.tif', (interet, 'float32')),
+                ('ratio_plancher_sol.tif', (np.where(self.srfSol14 != 0, self.srfPla14 / self.srfSol14, 0).astype(np.float32), 'float32'))
+            ])
+        # Capacité au sol des cellules non candidates, pour les points de reprise avec sparse (le raster n'est alors jamais modifié)
+        # Sans sparse, les points de reprise n'ont pas besoin du raster initial
+        self.capaSol14 = capaSol if p.sparse else None
+
+        # Nombre de cellules urbanisées dans le voisinage, tenu à jour à chaque ouverture de cellule
+        self.counter = ContigCounter(self.urb14, p.winSize, p.minContig, p.maxContig)
+
+        # Index à plat des cellules candidates : la première ligne et la première colonne ne sont jamais urbanisées
+        inner = np.zeros([rows, cols], np.bool_)
+        inner[1:, 1:] = True
+        interet = np.where(inner, interet, 0)
+        if p.sparse:
+            self.cellIndex = np.flatnonzero((interet > 0) & ((capaSol > 0) | (data.srfSolRes > 0)))
+        else:
+            self.cellIndex = np.arange(rows * cols)
+        self.nbCells = self.cellIndex.size
+        if self.verbose:
+            print(str(self.nbCells) + ' candidate cells out of ' + str(rows * cols))
+
+        # Vecteurs des cellules candidates : données d'entrée puis état de la simulation
+        self.irisId = self.cellView(data.irisId)
+        self.interet = self.cellView(interet)
+        self.capaSol = self.cellView(capaSol)
+        self.txArtif = self.cellView(txArtif)
+        self.m2PlaHab = self.cellView(m2PlaHab)
+        self.srfSolRes14 = self.cellView(data.srfSolRes)
+        self.txSsr = self.cellView(data.txSsr)
+        self.pluPrio = self.cellView(data.pluPrio) if not self.skipZau else None
+        self.tableEtages = data.tableEtages
+        self.tableSurfaces = data.tableSurfaces
+
+        # Intialisation des flux aléatoires (cellules, surfaces, étages) à partir de la seed
+        self.rng = SimulationRng(p.seed)
+        self.year = None
+        self.preLog = 0
+        self.preBuilt = 0
+        self.restePop = 0
+        self.resteSrf = 0
+        self.skipZauYear = None
+        self.execTime = None
+        self.urb = self.cellView(self.urb14.copy())
+        self.srfSol = self.cellView(self.srfSol14.copy())
+        self.srfPla = self.cellView(self.srfPla14.copy())
+        self.srfSolRes = self.cellView(data.srfSolRes.copy())
+        self.demographie = self.cellView(self.demographie14.copy())
+
+        # Mesure optionnelle des temps par étape et des compteurs de tirages
+        self.profiler = None
+        if p.profile:
+            self.profiler = Profiler()
+            self.profiler.attach(self)
+
+        # Journal optionnel des constructions
+        self.eventLog = EventLog() if p.events else None
+        # Bilan annuel optionnel par IRIS
+        self.irisYears = IrisYears(data.nbIris + 1) if p.irisYears else None
+
+        # Reprise depuis un point de reprise écrit par checkpoint()
+        if p.resume:
+            self.restore(p.resume)
+
+    # Copie de la simulation avant sa première année avec une autre graine : les données et rasters statiques sont partagés, l'état est copié
+    def replica(self, seed):
+        if self.year is not None or self.profiler:
+            raise ValueError('only a simulation without profile or resume that has not started can be replicated')
+        sim = copy.copy(self)
+        kwargs = self.params.items()
+        growth = kwargs.pop('growth')
+        kwargs['seed'] = seed
+        sim.params = Parameters(growth, **kwargs)
+        sim.rng = SimulationRng(seed)
+        sim.counter = copy.deepcopy(self.counter)
+        sim.heatMap = self.heatMap.copy()
+        sim.eventLog = EventLog() if self.eventLog is not None else None
+        sim.irisYears = IrisYears(self.irisYears.size) if self.irisYears is not None else None
+        for name in self.state:
+            setattr(sim, name, getattr(self, name).copy())
+        return sim
+
+    # Vecteurs de l'état et raster de départ de chacun (valeur des cellules non candidates, utilisée seulement avec sparse)
+    def stateInitial(self):
+        return OrderedDict([
+            ('urb', self.urb14),
+            ('srfSol', self.srfSol14),
+            ('srfPla', self.srfPla14),
+            ('srfSolRes', self.data.srfSolRes),
+            ('demographie', self.demographie14),
+            ('capaSol', self.capaSol14)
+        ])
+
+    # Point de reprise à la fin de l'année self.year : rasters de l'état, reliquats de l'année et flux aléatoires, dans un bundle
+    def checkpoint(self, path):
+        arrays = OrderedDict((name, self.toRaster(getattr(self, name), initial)) for name, initial in self.stateInitial().items())
+        arrays['heatMap'] = self.heatMap
+        if self.eventLog is not None:
+            arrays['events'] = self.eventLog.toArray()
+        if self.irisYears is not None:
+            arrays['irisYears'] = self.irisYears.toArray()
+        attributes = OrderedDict([
+            ('params', self.params.items()),
+            ('year', self.year),
+            ('rows', self.rows),
+            ('cols', self.cols),
+            ('preLog', toScalar(self.preLog)),
+            ('preBuilt', toScalar(self.preBuilt)),
+            ('restePop', toScalar(self.restePop)),
+            ('resteSrf', toScalar(self.resteSrf)),
+            ('skipZau', self.skipZau),
+            ('skipZauYear', self.skipZauYear),
+            ('rng', self.rng.getState())
+        ])
+        writeBundle(path, arrays, attributes)
+
+    # Reprend l'état d'un point de reprise ; la simulation continue à l'année suivante avec ses propres paramètres (variante)
+    # Les flux aléatoires ne sont repris que pour la même graine ; le compteur de contiguïté est recalculé avec winSize, minContig et maxContig
+    def restore(self, path):
+        p = self.params
+        attributes, arrays = readBundle(path)
+        if [attributes['rows'], attributes['cols']] != [self.rows, self.cols]:
+            raise ValueError(str(path) + ' was not made from these data')
+        if p.sparse:
+            outside = np.ones(self.rows * self.cols, np.bool_)
+            outside[self.cellIndex] = False
+        for name, initial in self.stateInitial().items():
+            raster = arrays[name]
+            # Avec sparse, l'état des cellules non candidates ne serait pas repris
+            if p.sparse and not np.array_equal(raster.ravel()[outside], initial.ravel()[outside]):
+                raise ValueError(str(path) + ' has changes outside the candidate cells, resume without sparse')
+            setattr(self, name, self.cellView(raster).copy())
+        self.heatMap = arrays['heatMap'].copy()
+        # Le journal et le bilan annuel repris couvrent les années depuis 2015
+        if self.eventLog is not None and 'events' in arrays:
+            self.eventLog = EventLog(arrays['events'])
+        if self.irisYears is not None and 'irisYears' in arrays:
+            self.irisYears = IrisYears(self.irisYears.size, arrays['irisYears'])
+        self.counter = ContigCounter(self.toRaster(self.urb, self.urb14), p.winSize, p.minContig, p.maxContig)
+        self.year = attributes['year']
+        self.preLog = attributes['preLog']
+        self.preBuilt = attributes['preBuilt']
+        self.restePop = attributes['restePop']
+        self.resteSrf = attributes['resteSrf']
+        self.skipZau = self.skipZau or attributes['skipZau']
+        self.skipZauYear = attributes['skipZauYear']
+        if attributes['params']['seed'] == p.seed:
+            self.rng.setState(attributes['rng'])
+
+    # Valeurs d'un raster sur les cellules candidates, à plat (vue sans copie quand toutes les cellules sont candidates)
+    def cellView(self, array):
+        return array.ravel()[self.cellIndex] if self.params.sparse else array.ravel()
+
+    # Reconstitue un raster complet à partir des valeurs des cellules candidates et du raster initial
+    def toRaster(self, values, initial):
+        if not self.params.sparse:
+            return values.reshape(self.rows, self.cols)
+        raster = initial.copy()
+        raster.ravel()[self.cellIndex] = values
+        return raster
+
+    # Rasters complets de l'état courant
+    def rasters(self):
+        return OrderedDict([
+            ('demographie', self.toRaster(self.demographie, self.demographie14)),
+            ('urbanisation', self.toRaster(self.urb, self.urb14)),
+            ('surface_sol', self.toRaster(self.srfSol, self.srfSol14)),
+            ('surface_plancher', self.toRaster(self.srfPla, self.srfPla14))
+        ])
+
+    # Tirage pondéré qui retourne la position d'une cellule candidate, à partir d'un WeightedSampler construit sur les cellules candidates
+    def chooseCell(self, sampler):
+        i = sampler.draw(self.rng.cells())
+        row, col = divmod(self.cellIndex[i], self.cols)
+        self.heatMap[row][col] += 1
+        return i
+
+    def chooseArea(self, id):
+        ss = 0
+        c = self.tableSurfaces.draw(id, self.rng.surfaces)
+        if c is not None and c > 0:
+            ss = float(c)
+        return ss
+
+    def chooseFloors(self, id):
+        nbNiv = 0
+        c = self.tableEtages.draw(id, self.rng.floors)
+        if c is not None:
+            nbNiv = c
+        return nbNiv
+
+    # Artificialisation d'une surface cellule vide ou déjà urbanisée (dans ce cas on ne vérifie pas la contiguité)
+    # Retourne un flottant python comme chooseArea() : un scalaire uint16 de capaSol ferait boucler artif et le reste à construire sous zéro
+    def expand(self, i, new=False):
+        ss = 0
+        id = self.irisId[i]
+        if new:
+            if self.counter.eligible.item(self.cellIndex[i]):
+                ss = self.chooseArea(id)
+                if ss > 0:
+                    maxSrf = float(self.capaSol[i])
+                    if ss > maxSrf :
+                        ss = maxSrf
+        else:
+            maxSrf = float(self.capaSol[i])
+            ss = self.chooseArea(id)
+            if ss > 0:
+                if ss > maxSrf :
+                    ss = maxSrf
+        return ss
+
+    # Pour construire verticalement une surface au sol donnée après le tirage "surfaces"
+    def build(self, i, ss):
+        sp = 0
+        id = self.irisId[i]
+        nbNiv = self.chooseFloors(id)
+        if nbNiv > 0:
+            sp = ss * nbNiv
+        return sp
+
+    # Pour densifier verticalement une surface au sol donnée, à partir du fitting "floors"
+    def reshape(self, i):
+        sp = 0
+        id = self.irisId[i]
+        ssol = self.srfSolRes[i]
+        spla = self.srfPla[i]
+        nivMoy = float(spla / ssol) if ssol != 0 else 0
+        nivMax = self.tableEtages.maxFit[id]
+        if int(nivMax) > round(nivMoy) :
+            # On cherche à tirer un nombre d'étage spérieur à l'existant
+            nbNiv = self.chooseFloors(id)
+            if nbNiv > nivMoy:
+                sp = ssol * nbNiv
+                # On enlève l'existant pour connaîte la surface nouvelle
+                if sp > self.srfPla[i]:
+                    sp -= self.srfPla[i]
+                    # On vérifie que la surface finale suffit à loger au moins une personne
+                    if sp < self.m2PlaHab[i]:
+                        sp = 0
+                else:
+                    sp = 0
+        return sp
+
+    # Nombre de personnes logées par une surface plancher dans une cellule (même arrondi que le comptage sur toute la grille)
+    def housed(self, spla, i):
+        m2 = self.m2PlaHab[i]
+        return int(round(float(spla) / float(m2))) if m2 != 0 else 0
+
+    # Tableaux de travail d'une année : constructions de l'année, intérêt des cellules encore constructibles et poids du tirage
+    # Pour SimulationBatch, l'état a une première dimension par réplicat et zau est une colonne de booléens (un par réplicat)
+    def yearArrays(self, zau, eligible=None):
+        p = self.params
+        shape = self.capaSol.shape
+        tmpUrb = np.zeros(shape, np.byte)
+        tmpSrfPla = np.zeros(shape, np.uint16)
+        tmpSrfSol = np.zeros(shape, np.uint16)
+        tmpInteret = np.where((self.txArtif <= p.exclusionRatio) & (self.capaSol > 0), self.interet, 0)
+        if np.any(zau):
+            # On limite l'urbanisation aux ZAU (if pluPriority)
+            tmpInteret = np.where(np.logical_and(zau, self.pluPrio != 1), 0, tmpInteret)
+        # Avec contigFilter, seules les cellules vides qui respectent déjà la règle de contiguïté sont proposées au tirage
+        weights = np.where((self.urb == 1) | eligible, tmpInteret, 0) if p.contigFilter else tmpInteret
+        return tmpUrb, tmpSrfPla, tmpSrfSol, tmpInteret, weights
+
+    # Mise à jour de l'état avec les constructions de l'année (pour SimulationBatch, de tous les réplicats à la fois)
+    def commit(self, tmpUrb, tmpSrfSol, tmpSrfPla):
+        self.urb[tmpUrb == 1] = 1
+        self.srfSol += tmpSrfSol
+        if self.params.buildNonRes:
+            tmpSrfSol = (tmpSrfSol * self.txSsr).round().astype(np.uint16)
+        self.srfSolRes += tmpSrfSol
+        self.srfPla += tmpSrfPla
+        self.demographie += np.where(self.m2PlaHab != 0, (tmpSrfPla / self.m2PlaHab).round(), 0).astype(np.uint16)
+
+    # Fonction principale pour gérer artificialisation puis densification, sur les vecteurs des cellules candidates
+    # arrays (tableaux de l'année et arbre de tirage) est fourni par SimulationBatch, qui met alors lui-même l'état à jour
+    def urbanize(self, pop, srfMax, zau=False, arrays=None):
+        p = self.params
+        cellIndex, nbCells, counter = self.cellIndex, self.nbCells, self.counter
+        urb, capaSol, txSsr = self.urb, self.capaSol, self.txSsr
+        eventLog = self.eventLog
+        artif = 0
+        count = 0
+        # Compteurs de tirages pour le profil (quelques additions d'entiers, conservés même sans profil)
+        draws = noCapacity = noContig = noArea = noFloors = builds = 0
+        if arrays is None:
+            tmpUrb, tmpSrfPla, tmpSrfSol, tmpInteret, weights = self.yearArrays(zau, self.cellView(counter.eligible) if p.contigFilter else None)
+            sampler = WeightedSampler(weights)
+        else:
+            tmpUrb, tmpSrfPla, tmpSrfSol, tmpInteret, sampler = arrays
+        # Expansion par ouverture de nouvelles cellules ou densification au sol de cellules déja urbanisées
+        while artif < srfMax and count < pop and sampler.total() > 0:
+            # Tant qu'il reste des gens à loger et de la surface à construire
+            ss = 0
+            sp = 0
+            i = self.chooseCell(sampler)
+            draws += 1
+            if capaSol[i] > 0:
+                new = urb[i] == 0 and tmpUrb[i] == 0
+                if new:
+                    # Pour ouvrir une nouvelle cellule à l'urbanisation
+                    ss = self.expand(i, new=True)
+                else:
+                    # Sinon on construit à côté d'autres bâtiments
+                    ss = self.expand(i)
+                if ss > 0 :
+                    # Les fonctions retournent 0 si quelque chose empêche d'urbaniser la cellule
+                    if p.buildNonRes:
+                        # On réduit la surface construite à une part de résidentiel avant de calculer la surface plancher
+                        ssr = ss * txSsr[i] if txSsr[i] > 0 else ss
+                        sp = self.build(i, ssr)
+                    else:
+                        sp = self.build(i, ss)
+                    if sp > 0:
+                        builds += 1
+                        # On met à jour les rasters uniquement si on la construction sol et plancher s'est déroulée correctement
+                        if new:
+                            flips = counter.add(*divmod(cellIndex[i], self.cols))
+                            if p.contigFilter:
+                                # Les cellules voisines encore vides entrent ou sortent du tirage selon leur nouvelle contiguïté
+                                for f in flips:
+                                    j = np.searchsorted(cellIndex, f)
+                                    if j < nbCells and cellIndex[j] == f and j != i and urb[j] == 0 and tmpUrb[j] == 0:
+                                        sampler.update(j, tmpInteret[j] if counter.eligible.item(f) else 0)
+                        tmpUrb[i] = 1
+                        capaSol[i] -= ss
+                        tmpSrfSol[i] += ss
+                        # Mise à jour incrémentale du nombre de personnes logées à partir de la seule cellule modifiée
+                        before = self.housed(tmpSrfPla[i], i)
+                        tmpSrfPla[i] += sp
+                        people = self.housed(tmpSrfPla[i], i) - before
+                        count += people
+                        artif += ss
+                        if eventLog is not None:
+                            eventLog.add(self.year, cellIndex[i], EXPAND if new else GROUND, zau, ss, sp, people)
+                    # Sinon on ajuste l'intérêt à 0 pour que la cellule ne soit plus tirée (pour l'année en cours)
+                    else:
+                        noFloors += 1
+                        tmpInteret[i] = 0
+                        sampler.update(i, 0)
+                else:
+                    if new and not counter.eligible.item(cellIndex[i]):
+                        noContig += 1
+                    else:
+                        noArea += 1
+                    tmpInteret[i] = 0
+                    sampler.update(i, 0)
+            else:
+                noCapacity += 1
+                tmpInteret[i] = 0
+                sampler.update(i, 0)
+
+        if sampler.total() == 0 and zau:
+            self.skipZau = True
+            self.skipZauYear = self.year
+            if self.verbose:
+                print("pluPriority : tmpInteret.sum() == 0 -> skipping ZAU from now on.")
+
+        lastYear = self.year == p.finalYear
+        densifyDraws = chosenCells = 0
+        if count < pop and (p.forceEachYear or (p.densifyOld and lastYear)):
+            tmpInteret = np.zeros(nbCells, np.byte)
+            # Densification du bâti existant en fin de simu si on n'a pas pu loger tout le monde (if densifyOld)
+            if lastYear and p.densifyOld:
+                tmpInteret = np.where(self.srfSolRes14 > 0, self.interet, 0)
+                if self.verbose:
+                        print("densifyOld : trying to densify old buildings because " + str(int(pop - count)) + " peoples are still homeless.")
+            elif p.forceEachYear and (artif >= srfMax or tmpInteret.sum() == 0):
+                # Ici on force à densifier l'existant en hauteur pour loger tout le monde (à chaque itération)
+                if self.verbose:
+                        print("forceEachYear : trying to densify and get " + str(int(pop-count)) + " people under a roof.")
+                if tmpUrb.sum() > 0:
+                    tmpInteret = np.where((tmpUrb == 1) & (self.srfSolRes > 0), self.interet, 0)
+
+            choosableCells = (np.where(tmpInteret > 0, 1, 0)).sum()
+            if self.verbose:
+                print(str(choosableCells) + ' available cells for the densification process...')
+            # On tente de loger les personnes restantes
+            sampler = WeightedSampler(tmpInteret)
+            while count < pop and sampler.total() > 0:
+                sp = 0
+                i = self.chooseCell(sampler)
+                densifyDraws += 1
+                sp = self.reshape(i)
+                if sp > 0:
+                    chosenCells += 1
+                    before = self.housed(tmpSrfPla[i], i)
+                    tmpSrfPla[i] += sp
+                    people = self.housed(tmpSrfPla[i], i) - before
+                    count += people
+                    if eventLog is not None:
+                        eventLog.add(self.year, cellIndex[i], FLOORS, False, 0, sp, people)
+                else:
+                    sampler.update(i, 0)
+
+            if self.verbose:
+                print(str(chosenCells) + " cells were successfully rebuilt.")
+
+        if self.profiler:
+            self.profiler.count(OrderedDict([
+                ('draws', draws),
+                ('rejectedCapacity', noCapacity),
+                ('rejectedContiguity', noContig),
+                ('rejectedArea', noArea),
+                ('rejectedFloors', noFloors),
+                ('builds', builds),
+                ('densifyDraws', densifyDraws),
+                ('densifyRejected', densifyDraws - chosenCells),
+                ('densified', chosenCells)
+            ]))
+
+        # Bilan de l'année par IRIS, sur les seules cellules construites cette année
+        if self.irisYears is not None:
+            self.irisYears.add(self.year, self.irisId, tmpSrfSol, tmpSrfPla, urb, self.m2PlaHab)
+
+        # Mise à jour de l'état des cellules candidates
+        if arrays is None:
+            self.commit(tmpUrb, tmpSrfSol, tmpSrfPla)
+        # Retourne le trop ou le manque pour itération suivante
+        return (pop - count, srfMax - artif)
+
+    # Simulation d'une année
+    def step(self, year, arrays=None):
+        self.year = year
+        srfMax = self.dicSrf[year]
+        popALoger = self.popDic[year]
+        restePop, resteSrf = self.urbanize(popALoger - self.preLog, srfMax - self.preBuilt, zau=not self.skipZau, arrays=arrays)
+        self.preBuilt = -resteSrf
+        self.preLog = -restePop
+        self.restePop = restePop
+        self.resteSrf = resteSrf
+        if self.verbose:
+            print('Remaining population : '  + str(restePop))
+            print('Remaining surface to build : ' + str(resteSrf))
+
+    # Boucle principale pour itération annuelle ; onYear(simulation, year) est appelée après chaque année
+    # Après une reprise, la boucle commence à l'année qui suit le point de reprise
+    def run(self, onYear=None, progress=True):
+        start_time = time()
+        for year in range(2015 if self.year is None else self.year + 1, self.params.finalYear + 1):
+            if self.verbose:
+                print('\n')
+            if progress:
+                printer("Year %i/%i" %(year, self.params.finalYear))
+            if self.verbose:
+                print('\n')
+            if self.profiler:
+                self.profiler.year = year
+            self.step(year)
+            if onYear:
+                onYear(self, year)
+        if self.profiler:
+            self.profiler.year = None
+        self.execTime = round(time() - start_time, 2)
+
+    # Indicateurs de mesures.csv et de log.txt, sans les rasters de sortie ni les bilans par groupe
+    # Calculés sur les vecteurs des cellules candidates : les autres cellules ne changent pas au cours de la simulation
+    def metrics(self):
+        srfCell = self.data.srfCell
+        resteSrf = str(int(round(self.resteSrf if self.resteSrf > 0 else 0)))
+        restePop = str(int(round(self.restePop if self.restePop > 0 else 0)))
+        urb14, srfSol14 = self.cellView(self.urb14), self.cellView(self.srfSol14)
+        built14 = urb14 == 1
+
+        popNouv = self.demographie - self.cellView(self.demographie14)
+        peuplementMoyen = round(np.nanmean(np.where(popNouv == 0, np.nan, popNouv)), 3)
+        srfSolNouv = self.srfSol - srfSol14
+        srfPla14 = self.cellView(self.srfPla14)
+        srfPlaNouv = self.srfPla - srfPla14
+        txArtifNouv = (srfSolNouv / srfCell).astype(np.float32)
+        txArtifMoyen = round(np.nanmean(np.where(txArtifNouv == 0, np.nan, txArtifNouv)) * 100, 3)
+        dsfSol = ((self.srfSol > srfSol14) & built14).sum()
+        dsfPla = ((self.srfPla > srfPla14) & built14).sum()
+        expansionSum = ((urb14 == 0) & (self.urb == 1)).sum()
+        builtCellsRatio = expansionSum / self.totalCapacity
+        impactEnv = round((srfSolNouv * (1 - self.cellView(self.data.eco))).sum() * builtCellsRatio)
+
+        mesures = OrderedDict([
+            ("Population not put up", restePop),
+            ("Unbuilt area", resteSrf),
+            ("Average cell populating", peuplementMoyen),
+            ("Area expansion", srfSolNouv.sum()),
+            ("Built floor area", srfPlaNouv.sum()),
+            ("Cells open to urbanisation", expansionSum),
+            ("Average artificialisation rate", txArtifMoyen),
+            ("Cumulated environnemental impact", int(impactEnv)),
+            ("Ground-densified cells count", dsfSol if dsfSol > 0 else 'NA'),
+            ("Floor-densified cells count", dsfPla if dsfPla > 0 else 'NA')
+        ])
+        popNouvSum = popNouv.sum()
+        log = OrderedDict([
+            ("Unbuilt area", resteSrf),
+            ("Population not put up", restePop),
+            ("Population put up", popNouvSum),
+            ("Final demography", self.demographie14.sum() + popNouvSum),
+            ("ZAU saturation year", self.skipZauYear),
+            ("Total number of randomly chosen cells", self.heatMap.sum()),
+            ("Execution time", self.execTime)
+        ])
+        return {'mesures': mesures, 'log': log}
+
+    # Bilan par IRIS et consommation par classe d'occupation du sol, par sommes groupées sur les cellules candidates (aggregate.py)
+    def aggregates(self):
+        urb14, srfSol14, srfPla14 = self.cellView(self.urb14), self.cellView(self.srfSol14), self.cellView(self.srfPla14)
+        built14 = urb14 == 1
+        popNouv = self.demographie - self.cellView(self.demographie14)
+        srfSolNouv = self.srfSol - srfSol14
+        iris = groupSums(self.irisId, self.data.nbIris + 1, OrderedDict([
+            ('population_nouvelle', popNouv),
+            ('surface_sol_construite', srfSolNouv),
+            ('surface_plancher_construite', self.srfPla - srfPla14),
+            ('cellules_ouvertes', (urb14 == 0) & (self.urb == 1)),
+            ('cellules_densifiees_sol', (self.srfSol > srfSol14) & built14),
+            ('cellules_densifiees_plancher', (self.srfPla > srfPla14) & built14),
+            ('cellules_peuplees', popNouv != 0)
+        ]))
+        return iris, self.consoOcs()
+
+    # Surface au sol construite par classe d'occupation du sol (hors classe 0)
+    def consoOcs(self):
+        srfSolNouv = self.srfSol - self.cellView(self.srfSol14)
+        ocsSums = groupSums(self.cellView(self.data.ocsLabels), len(self.data.ocsClasses), {'srfSol': srfSolNouv})['srfSol']
+        consoOcs = OrderedDict()
+        for c, surface in zip(self.data.ocsClasses, ocsSums):
+            if int(c) != 0:
+                consoOcs[int(c)] = int(surface)
+        return consoOcs
+
+    # Indicateurs de metrics(), rasters de sortie et bilans par IRIS et par classe d'occupation du sol
+    def results(self):
+        p = self.params
+        srfCell = self.data.srfCell
+        finalYear = str(p.finalYear)
+
+        # On repasse aux rasters complets pour le calcul des rasters de sortie
+        current = self.rasters()
+        urb = current['urbanisation']
+        srfSol = current['surface_sol']
+        srfPla = current['surface_plancher']
+        demographie = current['demographie']
+        srfSol14, srfPla14, urb14 = self.srfSol14, self.srfPla14, self.urb14
+
+        popNouv = demographie - self.demographie14
+        ratioPlaSol = np.where(srfSol != 0, srfPla / srfSol, 0).astype(np.float32)
+        srfSolNouv = srfSol - srfSol14
+        srfPlaNouv = srfPla - srfPla14
+        densifSol = np.where((srfSol > srfSol14) & (urb14 == 1), 1, 0)
+        densifPla = np.where((srfPla > srfPla14) & (urb14 == 1), 1, 0)
+        txArtifFinal = (srfSol / srfCell).astype(np.float32)
+        expansion = np.where((urb14 == 0) & (urb == 1), 1, 0)
+
+        outputs = OrderedDict([
+            ('choices_heatmap.tif', (self.heatMap, 'byte')),
+            ('urbanisation_' + finalYear + '.tif', (urb, 'uint16')),
+            ('surface_sol_' + finalYear + '.tif', (srfSol, 'uint16')),
+            ('surface_plancher_' + finalYear + '.tif', (srfPla, 'uint16')),
+            ('demographie_' + finalYear + '.tif', (demographie, 'uint16')),
+            ('ratio_plancher_sol_' + finalYear + '.tif', (ratioPlaSol, 'float32')),
+            ('taux_artif_' + finalYear + '.tif', (txArtifFinal, 'float32')),
+            ('contiguite_' + finalYear + '.tif', (windowMean(urb, p.winSize), 'float32')),
+            ('expansion.tif', (expansion, 'byte')),
+            ('surface_sol_construite.tif', (srfSolNouv, 'uint16')),
+            ('surface_plancher_construite.tif', (srfPlaNouv, 'uint16')),
+            ('population_nouvelle.tif', (popNouv, 'uint16'))
+        ])
+        if p.exclusionRatio > 0:
+            outputs['densification_sol.tif'] = (densifSol, 'byte')
+        if p.densifyOld:
+            outputs['densification_plancher.tif'] = (densifPla, 'byte')
+
+        metrics = self.metrics()
+        metrics['outputs'] = outputs
+        metrics['iris'], metrics['consoOcs'] = self.aggregates()
+        return metrics
+
+    # Ce qu'agrège Replicates, au format de results() : indicateurs de metrics(), rasters suivis (Replicates.rasters et expansion.tif)
+    # et consommation par classe d'occupation du sol, sans les autres rasters de sortie ni le bilan par IRIS
+    def replicateResults(self):
+        urb = self.toRaster(self.urb, self.urb14)
+        srfSol = self.toRaster(self.srfSol, self.srfSol14)
+        demographie = self.toRaster(self.demographie, self.demographie14)
+        metrics = self.metrics()
+        metrics['outputs'] = OrderedDict([
+            ('choices_heatmap.tif', (self.heatMap, 'byte')),
+            ('urbanisation_' + str(self.params.finalYear) + '.tif', (urb, 'uint16')),
+            ('expansion.tif', (np.where((self.urb14 == 0) & (urb == 1), 1, 0), 'byte')),
+            ('surface_sol_construite.tif', (srfSol - self.srfSol14, 'uint16')),
+            ('population_nouvelle.tif', (demographie - self.demographie14, 'uint16'))
+        ])
+        metrics['consoOcs'] = self.consoOcs()
+        return metrics
+
+# Réplicats de mêmes paramètres simulés ensemble, année par année : l'état est porté par des matrices réplicat x cellule
+# L'intérêt de l'année, les arbres de tirage et la mise à jour de fin d'année sont calculés une seule fois pour tous les réplicats,
+# seules les boucles de tirage restent propres à chacun ; chaque réplicat donne les mêmes résultats qu'une simulation seule de même graine
+class SimulationBatch:
+    def __init__(self, params, data, seeds):
+        kwargs = params.items()
+        growth = kwargs.pop('growth')
+        kwargs['profile'] = False
+        # Les données et rasters statiques ne sont calculés qu'une fois ; template porte ensuite l'état de tous les réplicats
+        self.template = Simulation(Parameters(growth, **kwargs), data)
+        self.replicas = [self.template.replica(seed) for seed in seeds]
+        for name in Simulation.state:
+            stack = np.stack([getattr(sim, name) for sim in self.replicas])
+            setattr(self.template, name, stack)
+            for sim, row in zip(self.replicas, stack):
+                setattr(sim, name, row)
+        self.execTime = None
+
+    def step(self, year):
+        t = self.template
+        zau = np.array([[not sim.skipZau] for sim in self.replicas])
+        eligible = np.stack([sim.cellView(sim.counter.eligible) for sim in self.replicas]) if t.params.contigFilter else None
+        tmpUrb, tmpSrfPla, tmpSrfSol, tmpInteret, weights = t.yearArrays(zau, eligible)
+        samplers = WeightedSampler.stack(weights)
+        for r, sim in enumerate(self.replicas):
+            sim.step(year, (tmpUrb[r], tmpSrfPla[r], tmpSrfSol[r], tmpInteret[r], samplers[r]))
+        t.commit(tmpUrb, tmpSrfSol, tmpSrfPla)
+
+    # Comme Simulation.run ; onYear(batch, year) est appelée après chaque année, les réplicats sont dans batch.replicas
+    def run(self, onYear=None, progress=True):
+        start_time = time()
+        for year in range(2015, self.template.params.finalYear + 1):
+            if progress:
+                printer("Year %i/%i" %(year, self.template.params.finalYear))
+            self.step(year)
+            if onYear:
+                onYear(self, year)
+        self.execTime = round(time() - start_time, 2)
+        for sim in self.replicas:
+            sim.execTime = self.execTime
+
+    # Résultats de chaque réplicat, au format de Simulation.results()
+    def results(self):
+        return [sim.results() for sim in self.replicas]
+
+    # Ce qu'agrège Replicates pour chaque réplicat (Simulation.replicateResults())
+    def replicateResults(self):
+        return [sim.replicateResults() for sim in self.replicas]
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import os
+import re
+import sys
+import csv
+import fcntl
+import socket
+import traceback
+import numpy as np
+from uuid import uuid4
+from math import gcd
+from fractions import Fraction
+from functools import reduce
+from pathlib import Path
+from multiprocessing import Pool
+from collections import OrderedDict
+from toolbox import printer
+from bundle import readBundle, writeBundle
+from simulation import Parameters
+from sweep import resultRow
+
+# Entrepôt de résultats en colonnes (paramètre store de simulate.py) : une ligne typée par simulation avec tous ses paramètres,
+# ses indicateurs (mesures.csv et log.txt) et ses temps, dans un répertoire partagé par toutes les simulations d'un plan
+# - colonnes.bundle : une colonne par champ, lue par projection mémoire (bundle.py)
+# - parts/*.bundle : lignes ajoutées depuis le dernier compactage, un fichier par ajout
+# Chaque ajout est écrit sous un nom temporaire puis renommé (os.replace, atomique) : les écrivains concurrents, même sur
+# plusieurs machines, n'ont pas de verrou à prendre et un lecteur ne voit jamais de ligne à moitié écrite
+# compact() réunit les parts dans colonnes.bundle sous verrou ; les parts réunies y sont listées pour ne jamais être lues deux fois
+# Le verrou (flock) n'exclut que les processus d'une même machine : il n'est pas fiable sur un système de fichiers réseau (NFS),
+# où deux compactages simultanés peuvent perdre des parts. Les compactages (store.py compact ou ingest) se lancent donc depuis
+# une seule machine ; les ajouts des simulations, eux, peuvent venir de partout
+COLUMNS = 'colonnes.bundle'
+PARTS = 'parts'
+LOCK = 'verrou'
+
+# Champs hors paramètres qui ne sont pas des indicateurs numériques
+fieldTypes = OrderedDict([('project', str), ('pixSize', int)])
+# Valeur d'un champ absent (paramètre inconnu d'un répertoire ingéré, indicateur NA...)
+missing = {bool: False, int: -1, float: np.nan, str: ''}
+dtypes = {bool: np.bool_, int: np.int64, float: np.float64, str: str}
+
+# Lignes de log.txt reprises à l'ingestion : indicateurs de Simulation.metrics()['log'] et temps total écrit par simulate.py
+logKeys = ['Unbuilt area', 'Population not put up', 'Population put up', 'Final demography', 'ZAU saturation year',
+           'Total number of randomly chosen cells', 'Execution time', 'Total time']
+
+# Type d'un champ : celui de la valeur par défaut pour les paramètres, flottant pour les indicateurs et les temps
+def fieldType(name):
+    if name == 'growth':
+        return float
+    if name in Parameters.defaults:
+        return type(Parameters.defaults[name])
+    return fieldTypes.get(name, float)
+
+def toValue(kind, value):
+    if value is None or (isinstance(value, str) and value.strip() in ['', 'NA', 'None', 'nan']):
+        return missing[kind]
+    if kind is bool:
+        return value.strip() == 'True' if isinstance(value, str) else bool(value)
+    if kind is int:
+        return int(round(float(value)))
+    if kind is float:
+        # Par le texte, comme dans mesures.csv (les indicateurs float32 ne sont pas élargis)
+        return float(str(value))
+    return str(value)
+
+# Ligne de l'entrepôt pour une simulation terminée (results : Simulation.metrics() ou results())
+def storeRow(values, pixSize, project, results, totalTime):
+    row = OrderedDict([('project', project), ('pixSize', pixSize)])
+    row.update(values)
+    row.update(resultRow(results))
+    row['Total time'] = totalTime
+    return row
+
+# Colonnes typées à partir de lignes (dictionnaires), dans l'ordre d'apparition des champs
+def toColumns(rows):
+    names = OrderedDict()
+    for row in rows:
+        for name in row:
+            names[name] = True
+    columns = OrderedDict()
+    for name in names:
+        kind = fieldType(name)
+        columns[name] = np.array([toValue(kind, row.get(name)) for row in rows], dtypes[kind])
+    return columns
+
+# Concaténation de tables de colonnes ; un champ absent d'une table prend la valeur manquante de son type
+def concat(tables):
+    names = OrderedDict()
+    for table in tables:
+        for name in table:
+            names[name] = True
+    columns = OrderedDict()
+    for name in names:
+        kind = fieldType(name)
+        parts = []
+        for table in tables:
+            if name in table:
+                parts.append(np.asarray(table[name]))
+            elif len(table):
+                size = len(next(iter(table.values())))
+                parts.append(np.full(size, missing[kind], dtypes[kind]))
+        columns[name] = np.concatenate(parts) if parts else np.zeros(0, dtypes[kind])
+    return columns
+
+# Écrit un bundle de colonnes sous un nom temporaire puis le renomme
+def writeColumns(path, columns, attributes):
+    tmp = path.with_name('.' + path.name + '.' + uuid4().hex + '.tmp')
+    writeBundle(tmp, columns, attributes)
+    os.replace(str(tmp), str(path))
+
+# Ajoute des lignes à l'entrepôt, sans verrou ; sûr avec plusieurs processus ou machines écrivant en même temps
+def append(store, rows):
+    parts = Path(store)/PARTS
+    os.makedirs(str(parts), exist_ok=True)
+    name = '%s_%i_%s.bundle' % (socket.gethostname(), os.getpid(), uuid4().hex)
+    writeColumns(parts/name, toColumns(rows), OrderedDict([('rows', len(rows))]))
+
+# Identité du fichier des colonnes compactées, qui change à chaque compactage (None s'il n'existe pas encore)
+def stamp(path):
+    try:
+        stat = os.stat(str(path))
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+# Lecture cohérente : colonnes compactées et parts pas encore réunies ; retourne (colonnes, noms des parts présentes)
+# Si un compactage a lieu pendant la lecture, on recommence
+def read(store):
+    store = Path(store)
+    while True:
+        try:
+            before = stamp(store/COLUMNS)
+            tables = []
+            merged = set()
+            if before is not None:
+                attributes, arrays = readBundle(store/COLUMNS)
+                tables.append(arrays)
+                merged = set(attributes['parts'])
+            names = sorted(p.name for p in (store/PARTS).glob('*.bundle'))
+            for name in names:
+                if name not in merged:
+                    tables.append(readBundle(store/PARTS/name)[1])
+            if stamp(store/COLUMNS) == before:
+                return concat(tables), names
+        except FileNotFoundError:
+            pass
+
+# Toutes les lignes de l'entrepôt : dictionnaire nom: colonne numpy
+def load(store):
+    return read(store)[0]
+
+# Réunit les parts dans colonnes.bundle (un seul compactage à la fois sur une même machine), puis supprime les parts réunies
+def compact(store):
+    store = Path(store)
+    os.makedirs(str(store/PARTS), exist_ok=True)
+    with (store/LOCK).open('w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        columns, names = read(store)
+        writeColumns(store/COLUMNS, columns, OrderedDict([('parts', names)]))
+        for name in names:
+            try:
+                (store/PARTS/name).unlink()
+            except FileNotFoundError:
+                pass
+        return columns
+
+# Export CSV (une ligne par simulation), pour R ou un tableur
+def toCsv(store, path):
+    columns = load(store)
+    with Path(path).open('w', newline='') as w:
+        writer = csv.writer(w)
+        writer.writerow(list(columns))
+        writer.writerows(zip(*[c.tolist() for c in columns.values()]))
+
+# Paramètres encodés dans le nom d'un répertoire de projet (Parameters.projectName) ; None si le nom ne correspond pas
+projectPattern = re.compile(r'^(\d+)m_tx([^_]+)_([a-z]+)_winSize(\d+)_minContig([^_]+)_maxContig([^_]+)_maxBuiltRatio(\d+)_exclusionRatio([^_]+)((?:_[A-Za-z0-9]+)*)$')
+projectFlags = OrderedDict([('pluPrio', 'pluPriority'), ('buildNonRes', 'buildNonRes'), ('forceEachYear', 'forceEachYear'),
+                            ('densifyOld', 'densifyOld'), ('contigFilter', 'contigFilter')])
+
+def parseProjectName(name):
+    match = projectPattern.match(name)
+    if not match:
+        return None
+    pixSize, growth, scenario, winSize, minContig, maxContig, maxBuiltRatio, exclusionRatio, suffix = match.groups()
+    values = OrderedDict([('pixSize', pixSize), ('growth', growth), ('scenario', scenario), ('winSize', winSize),
+                          ('minContig', minContig), ('maxContig', maxContig), ('maxBuiltRatio', maxBuiltRatio),
+                          ('exclusionRatio', exclusionRatio)])
+    for flag in projectFlags.values():
+        values[flag] = False
+    values['finalYear'] = 2040
+    for part in suffix.split('_')[1:]:
+        if part in projectFlags:
+            values[projectFlags[part]] = True
+        elif part.isdigit():
+            values['finalYear'] = part
+        else:
+            return None
+    return values
+
+# Lignes "clé, valeur" d'un fichier CSV de simulate.py (mesures.csv, parametres.csv, coefficients_interet.csv)
+def readPairs(path):
+    pairs = OrderedDict()
+    with Path(path).open('r') as r:
+        for l in r:
+            if ', ' in l:
+                key, value = l.rstrip('\n').split(', ', 1)
+                pairs[key] = value
+    return pairs
+
+# Poids d'intérêt relus dans coefficients_interet.csv, qui les donne divisés par leur somme :
+# on retrouve les plus petits entiers proportionnels, égaux aux paramètres sauf s'ils ont un facteur commun
+def readWeights(path):
+    coefs = OrderedDict((key, Fraction(value).limit_denominator(1000)) for key, value in readPairs(path).items())
+    scale = 1
+    for coef in coefs.values():
+        scale = scale * coef.denominator // gcd(scale, coef.denominator)
+    weights = OrderedDict((key, int(coef * scale)) for key, coef in coefs.items())
+    common = reduce(gcd, weights.values(), 0) or 1
+    return OrderedDict((key, weight // common) for key, weight in weights.items())
+
+# Ligne de l'entrepôt pour un répertoire de projet écrit par simulate.py ; None si ce n'en est pas un (réplicats...)
+# Les paramètres sont relus dans parametres.csv : la ligne est alors celle que simulate.py ajoute avec le paramètre store
+# Pour un répertoire plus ancien, sans parametres.csv ni temps total dans log.txt, seuls les paramètres du nom du répertoire
+# et les poids d'intérêt (à un facteur commun près) sont retrouvés ; seed, replicates, batchSize, maxUsedSrfPla, sparse,
+# tiffs, snaps, snapStack, tifProfile, checkpoints, resume, verbose, profile, events, irisYears, metricsOnly, store
+# et Total time y prennent la valeur manquante de leur type (-1, False, vide ou NaN)
+def readRun(project):
+    project = Path(project)
+    row = OrderedDict([('project', str(project))])
+    values = parseProjectName(project.name)
+    if values is None:
+        return None
+    row.update(values)
+    if (project/'parametres.csv').exists():
+        row.update(readPairs(project/'parametres.csv'))
+    elif (project/'coefficients_interet.csv').exists():
+        row.update(readWeights(project/'coefficients_interet.csv'))
+    row.update(readPairs(project/'output/mesures.csv'))
+    if (project/'log.txt').exists():
+        with (project/'log.txt').open('r') as r:
+            for l in r:
+                key, _, value = l.rstrip('\n').partition(': ')
+                if key in logKeys and key not in row:
+                    row[key] = value
+    return row
+
+# Ajoute à l'entrepôt tous les répertoires de projet sous resultsDir ; les répertoires sont lus en parallèle
+def ingest(resultsDir, store, processes=1):
+    projects = sorted(path.parent.parent for path in Path(resultsDir).glob('**/output/mesures.csv'))
+    rows = []
+    with Pool(processes) as pool:
+        for done, row in enumerate(pool.imap_unordered(readRun, projects, chunksize=64)):
+            printer('Run %i/%i' %(done + 1, len(projects)))
+            if row is not None:
+                rows.append(row)
+    print('')
+    if rows:
+        append(store, rows)
+    compact(store)
+    return len(rows)
+
+if __name__ == '__main__':
+    try:
+        command = sys.argv[1]
+        if command == 'ingest':
+            processes = int(sys.argv[4]) if len(sys.argv) > 4 else os.cpu_count()
+            count = ingest(sys.argv[2], sys.argv[3], processes)
+            print(str(count) + ' runs added to ' + sys.argv[3])
+        elif command == 'compact':
+            columns = compact(sys.argv[2])
+            print(str(len(next(iter(columns.values()))) if columns else 0) + ' runs in ' + sys.argv[2])
+        elif command == 'csv':
+            toCsv(sys.argv[2], sys.argv[3])
+        else:
+            print('Unknown command ' + command + ' : ingest, compact or csv')
+    except:
+        print("\n*** Error :")
+        exc = sys.exc_info()
+        traceback.print_exception(*exc, limit=5, file=sys.stdout)
+        sys.exit()
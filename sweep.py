@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import sys
+import csv
+import json
+import traceback
+import numpy as np
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from multiprocessing import Pool
+from collections import OrderedDict
+from toolbox import printer
+from simulation import Parameters, InputData, Simulation
+
+# Lecture d'un plan d'expérience : CSV avec en-tête ou JSONL (un objet par ligne), une simulation par ligne
+def readPlan(path):
+    path = Path(path)
+    rows = []
+    with path.open('r') as r:
+        if path.suffix in ['.jsonl', '.json']:
+            for l in r:
+                if l.strip():
+                    rows.append(json.loads(l))
+        else:
+            for row in csv.DictReader(r):
+                rows.append({k.strip():v.strip() for k, v in row.items() if v is not None and v.strip() != ''})
+    return rows
+
+# Conversion d'une valeur du plan dans le type de la valeur par défaut du paramètre
+def convert(key, value):
+    default = Parameters.defaults[key]
+    if isinstance(default, bool):
+        if isinstance(value, str):
+            if value.lower() in ['true', 'false']:
+                return value.lower() == 'true'
+            value = float(value)
+        # Comme pour openMole, les booléens numériques sont vrais si > 0.5
+        return value > 0.5 if not isinstance(value, bool) else value
+    elif isinstance(default, int):
+        return round(float(value))
+    elif isinstance(default, float):
+        return float(value)
+    return str(value)
+
+# Paramètres d'une ligne du plan ; les colonnes inconnues sont ignorées (identifiants, commentaires...)
+def toParameters(row):
+    kwargs = {k:convert(k, v) for k, v in row.items() if k in Parameters.defaults}
+    return Parameters(row['growth'], **kwargs)
+
+# Indicateurs d'une simulation terminée (Simulation.metrics() ou results()), en une seule ligne
+def resultRow(results):
+    values = OrderedDict(results['mesures'])
+    for key, value in results['log'].items():
+        if key not in values:
+            values[key] = value
+    return values
+
+# Lance une ligne du plan ; retourne (index, paramètres, indicateurs ou None, erreur ou None)
+def runRow(data, i, row):
+    try:
+        params = toParameters(row)
+        sim = Simulation(params, data)
+        sim.run(progress=False)
+        return (i, params.items(), resultRow(sim.metrics()), None)
+    except Exception as e:
+        return (i, row, None, repr(e))
+
+# Lance toutes les lignes du plan sur les mêmes données chargées une seule fois
+# Retourne un générateur de résultats au format de runRow()
+def runPlan(data, rows):
+    for i, row in enumerate(rows):
+        yield runRow(data, i, row)
+
+# Données d'entrée partagées entre processus : chaque array est écrit une seule fois en .npy dans directory
+# Les processus l'ouvrent en lecture seule par projection mémoire et se partagent donc les mêmes pages
+# Seul l'état des simulations (urb, srfSol, srfPla, demographie, capaSol...) est alloué par chaque processus
+# Si les données viennent déjà d'un bundle, les processus l'ouvrent directement
+class SharedInputs:
+    def __init__(self, data, directory):
+        self.bundle = data.bundle
+        self.arrays = OrderedDict()
+        self.attributes = OrderedDict()
+        if self.bundle:
+            return
+        for key, value in vars(data).items():
+            if isinstance(value, np.ndarray):
+                path = str(Path(directory)/(key + '.npy'))
+                np.save(path, value)
+                self.arrays[key] = path
+            else:
+                self.attributes[key] = value
+
+    # InputData dont les rasters sont des vues sans copie sur les fichiers partagés
+    def attach(self):
+        if self.bundle:
+            return InputData(self.bundle)
+        data = InputData.__new__(InputData)
+        for key, value in self.attributes.items():
+            setattr(data, key, value)
+        for key, path in self.arrays.items():
+            setattr(data, key, np.asarray(np.load(path, mmap_mode='r')))
+        return data
+
+# Données du processus de calcul courant, attachées une seule fois à son démarrage
+workerData = None
+
+def attachWorker(shared):
+    global workerData
+    workerData = shared.attach()
+
+def runWorker(task):
+    return runRow(workerData, *task)
+
+# Lance le plan sur un pool de processes processus ; les résultats arrivent au fil de l'eau, dans l'ordre où les simulations se terminent
+def runPool(data, rows, processes, tmpDir=None):
+    with TemporaryDirectory(prefix='sweep_', dir=tmpDir) as directory:
+        shared = SharedInputs(data, directory)
+        with Pool(processes, initializer=attachWorker, initargs=(shared,)) as pool:
+            for result in pool.imap_unordered(runWorker, enumerate(rows)):
+                yield result
+
+# Écrit une ligne de résultats par simulation, dans l'ordre d'arrivée
+# Les échecs qui précèdent la première simulation réussie sont gardés jusqu'à ce que les colonnes soient connues
+def writeResults(results, path, total):
+    done = 0
+    pending = []
+    with Path(path).open('w', newline='') as w:
+        writer = None
+        for i, params, values, error in results:
+            done += 1
+            printer('Run %i/%i' %(done, total))
+            if error:
+                print('\nRun ' + str(i) + ' failed: ' + error)
+            line = {'run': i, 'error': error or ''}
+            line.update(params)
+            line.update(values or {})
+            pending.append(line)
+            if writer is None and values:
+                fields = ['run', 'growth'] + list(Parameters.defaults) + list(values) + ['error']
+                writer = csv.DictWriter(w, fields, extrasaction='ignore')
+                writer.writeheader()
+            if writer is not None:
+                writer.writerows(pending)
+                pending = []
+                w.flush()
+        if pending:
+            writer = csv.DictWriter(w, ['run', 'growth'] + list(Parameters.defaults) + ['error'], extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(pending)
+    print('')
+
+if __name__ == '__main__':
+    try:
+        dataDir = Path(sys.argv[1])
+        plan = readPlan(sys.argv[2])
+        output = Path(sys.argv[3])
+        processes = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+        data = InputData(dataDir)
+        if processes > 1:
+            results = runPool(data, plan, processes, str(output.resolve().parent))
+        else:
+            results = runPlan(data, plan)
+        writeResults(results, output, len(plan))
+    except:
+        print("\n*** Error :")
+        exc = sys.exc_info()
+        traceback.print_exception(*exc, limit=5, file=sys.stdout)
+        sys.exit()
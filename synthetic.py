@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import os
+import sys
+import osr
+import numpy as np
+from pathlib import Path
+from shutil import rmtree
+from toolbox import to_tif
+
+# Génère un répertoire de données préparées fictif, au même format que la sortie de prepare.py, pour tester et mesurer simulate.py
+# sans données IGN/INSEE ni QGIS. La grille contient quelques centres urbains dont la densité de bâti décroît avec la distance.
+def synthesize(outDir, size=200, nbIris=10, buildable=0.7, pixSize=50, growth=0.8, seed=0, plu=False, bundle=False):
+    if not 1 <= nbIris <= 255:
+        raise ValueError('nbIris should be between 1 and 255 (iris_id.tif is a byte raster)')
+    outDir = Path(outDir)
+    os.makedirs(str(outDir/'interet'))
+    rng = np.random.default_rng(seed)
+    rows = cols = size
+    srfCell = pixSize * pixSize
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(3035)
+    proj = srs.ExportToWkt()
+    geot = (3700000.0, float(pixSize), 0.0, 2300000.0, 0.0, -float(pixSize))
+
+    # IRIS : découpage de la grille en blocs rectangulaires numérotés de 1 à nbIris
+    nx = int(np.ceil(np.sqrt(nbIris)))
+    ny = int(np.ceil(nbIris / nx))
+    blockRow = (np.arange(rows) * ny // rows)[:, None]
+    blockCol = (np.arange(cols) * nx // cols)[None, :]
+    irisId = np.minimum(blockRow * nx + blockCol + 1, nbIris).astype(np.uint8)
+
+    # Distance au centre urbain le plus proche, en cellules
+    yy, xx = np.ogrid[0:rows, 0:cols]
+    nbCentres = min(1 + nbIris // 5, 20)
+    distance = np.full([rows, cols], np.inf, np.float32)
+    for cy, cx in zip(rng.integers(0, rows, nbCentres), rng.integers(0, cols, nbCentres)):
+        distance = np.minimum(distance, np.hypot(yy - cy, xx - cx).astype(np.float32))
+    scale = max(size / (4 * np.sqrt(nbCentres)), 1)
+    density = np.exp(-distance / scale)
+
+    # Bâti existant
+    urb = rng.random([rows, cols], np.float32) < density * 0.8
+    srfSol = np.where(urb, rng.integers(50, int(srfCell * 0.6), [rows, cols]), 0)
+    txSsrIris = rng.uniform(0.5, 0.95, nbIris + 1).astype(np.float32)
+    m2HabIris = rng.integers(30, 60, nbIris + 1).astype(np.uint16)
+    ssrMedIris = rng.integers(80, 400, nbIris + 1).astype(np.uint16)
+    txSsr = txSsrIris[irisId]
+    m2PlaHab = m2HabIris[irisId]
+    srfSolRes = np.round(srfSol * txSsr)
+    srfPla = np.minimum(srfSolRes * rng.integers(1, 5, [rows, cols]), 65535)
+    demographie = np.where(m2PlaHab > 0, np.round(srfPla / m2PlaHab), 0)
+
+    # Restrictions : une part 1 - buildable des cellules est inconstructible, ainsi que les bords
+    restriction = (rng.random([rows, cols], np.float32) >= buildable).astype(np.byte)
+    restriction[0, :] = restriction[-1, :] = restriction[:, 0] = restriction[:, -1] = 1
+
+    # Intérêts, entre 0 et 1 : proches des centres pour routes, transports et SIRENE, bruit à grande échelle pour l'écologie
+    coarse = rng.random([rows // 16 + 1, cols // 16 + 1], np.float32)
+    ecologie = np.kron(coarse, np.ones([16, 16], np.float32))[:rows, :cols]
+    routes = np.clip(density + rng.normal(0, 0.1, [rows, cols]), 0, 1).astype(np.float32)
+    transport = np.clip(density ** 2 + rng.normal(0, 0.05, [rows, cols]), 0, 1).astype(np.float32)
+    sirene = (density ** 3 / np.amax(density ** 3)).astype(np.float32)
+    # Occupation du sol : 1 pour le bâti, classes 2 à 6 ailleurs
+    ocs = np.where(urb, 1, rng.integers(2, 7, [rows, cols])).astype(np.uint16)
+
+    to_tif(irisId, 'byte', proj, geot, outDir/'iris_id.tif')
+    to_tif(ssrMedIris[irisId], 'uint16', proj, geot, outDir/'iris_ssr_med.tif')
+    to_tif(txSsr, 'float32', proj, geot, outDir/'iris_tx_ssr.tif')
+    to_tif(m2PlaHab, 'uint16', proj, geot, outDir/'iris_m2_hab.tif')
+    to_tif(demographie.astype(np.uint16), 'uint16', proj, geot, outDir/'demographie.tif')
+    to_tif(srfPla.astype(np.uint32), 'uint32', proj, geot, outDir/'srf_pla.tif')
+    to_tif(srfSolRes.astype(np.uint16), 'uint16', proj, geot, outDir/'srf_sol_res.tif')
+    to_tif(srfSol.astype(np.uint16), 'uint16', proj, geot, outDir/'srf_sol.tif')
+    to_tif(ocs, 'uint16', proj, geot, outDir/'classes_ocsol.tif')
+    to_tif(restriction, 'byte', proj, geot, outDir/'interet/restriction_totale.tif')
+    to_tif(ecologie, 'float32', proj, geot, outDir/'interet/non-importance_ecologique.tif')
+    to_tif(sirene, 'float32', proj, geot, outDir/'interet/densite_sirene.tif')
+    to_tif(routes, 'float32', proj, geot, outDir/'interet/proximite_routes.tif')
+    to_tif(transport, 'float32', proj, geot, outDir/'interet/proximite_transport.tif')
+    if plu:
+        # Zones à urbaniser autour des centres, zones naturelles au-delà
+        to_tif(((density > 0.3) & (density < 0.6)).astype(np.byte), 'byte', proj, geot, outDir/'interet/plu_priorite.tif')
+        to_tif((density < 0.05).astype(np.byte), 'byte', proj, geot, outDir/'interet/plu_restriction.tif')
+
+    # Historiques de population et de surface au sol, cohérents avec le taux growth (en %)
+    pop14 = int(demographie.sum())
+    ssol14 = int(srfSol.sum())
+    with (outDir/'population.csv').open('w') as w:
+        w.write('annee, demographie\n')
+        w.write('2009, ' + str(int(pop14 / (1 + growth / 100) ** 5)) + '\n')
+        w.write('2012, ' + str(int(pop14 / (1 + growth / 100) ** 2)) + '\n')
+        w.write('2014, ' + str(pop14) + '\n')
+    with (outDir/'evo_surface_sol.csv').open('w') as w:
+        w.write('annee, surface\n')
+        w.write('2009, ' + str(int(ssol14 / (1 + growth / 100) ** 4)) + '\n')
+        w.write('2014, ' + str(ssol14) + '\n')
+
+    # Distributions des étages et des surfaces par IRIS, aux formats des scripts R de fitting
+    with (outDir/'poids_etages.csv').open('w') as w:
+        w.write('"","ID_IRIS","FLOOR","n","poidsFitAIC","poidsFitCHI2"\n')
+        n = 1
+        for id in range(1, nbIris + 1):
+            weights = rng.dirichlet(np.arange(6, 0, -1))
+            for floor, weight in enumerate(weights, 1):
+                w.write('"%i","%i","%i",%i,%s,%s\n' %(n, id, floor, round(weight * 1000), repr(float(weight)), repr(float(weight))))
+                n += 1
+    with (outDir/'poids_surfaces.csv').open('w') as w:
+        w.write('"","SURF","poidsAD","poidsCVM","poidsKS","poidsAIC","ID_IRIS"\n')
+        n = 1
+        for id in range(1, nbIris + 1):
+            surfaces = np.arange(20, 1020, 20)
+            weights = np.exp(-(np.log(surfaces) - np.log(rng.uniform(100, 300))) ** 2)
+            weights /= weights.sum()
+            for surf, weight in zip(surfaces, weights):
+                w.write('"%i",%i,%s,%s,%s,%s,"%i"\n' %(n, surf, repr(float(weight)), repr(float(weight)), repr(float(weight)), repr(float(weight)), id))
+                n += 1
+    for name, values in [('poids_etages_nofit.csv', np.arange(1, 6)), ('poids_surfaces_nofit.csv', np.arange(50, 550, 50))]:
+        with (outDir/name).open('w') as w:
+            w.write('ID_IRIS,VALUE,effectif,poidsNormalise_a_l_IRIS\n')
+            for id in range(1, nbIris + 1):
+                effectifs = rng.integers(1, 100, values.size)
+                for value, effectif in zip(values, effectifs):
+                    w.write('%i,%i,%i,%s\n' %(id, value, effectif, repr(float(effectif / effectifs.sum()))))
+
+    if bundle:
+        from simulation import InputData, BUNDLE
+        InputData(outDir, bundle=False).save(outDir/BUNDLE)
+
+if __name__ == '__main__':
+    outDir = Path(sys.argv[1])
+    kwargs = {}
+    if len(sys.argv) > 2:
+        for arg in sys.argv[2].split():
+            if 'pixSize' in arg:
+                kwargs['pixSize'] = int(arg.split('=')[1])
+            elif 'size' in arg:
+                kwargs['size'] = int(arg.split('=')[1])
+            elif 'nbIris' in arg:
+                kwargs['nbIris'] = int(arg.split('=')[1])
+            elif 'buildable' in arg:
+                kwargs['buildable'] = float(arg.split('=')[1])
+            elif 'growth' in arg:
+                kwargs['growth'] = float(arg.split('=')[1])
+            elif 'seed' in arg:
+                kwargs['seed'] = int(arg.split('=')[1])
+            elif 'plu' in arg:
+                kwargs['plu'] = True
+            elif 'bundle' in arg:
+                kwargs['bundle'] = True
+            elif 'force' in arg:
+                if outDir.exists():
+                    rmtree(str(outDir))
+    synthesize(outDir, **kwargs)
+    print('Written ' + str(outDir))
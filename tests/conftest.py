@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+import sys
+from pathlib import Path
+
+# Les scripts sont des modules à la racine du dépôt
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
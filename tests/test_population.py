@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+import pytest
+from synthetic import synthesize
+from simulation import Parameters, InputData, Simulation
+
+def notPutUp(sim):
+    return int(sim.metrics()['mesures']['Population not put up'])
+
+# Capacité épuisée (presque rien de constructible, maxBuiltRatio à 1 %) : les restes à loger et à construire sont les vrais
+# manques, et non des entiers non signés passés sous zéro (RuntimeWarning d'overflow changé en erreur)
+@pytest.mark.filterwarnings('error::RuntimeWarning')
+def test_population_exceeding_capacity(tmp_path):
+    synthesize(tmp_path, size=40, nbIris=4, buildable=0.01)
+    sim = Simulation(Parameters(2.0, finalYear=2020, maxBuiltRatio=1), InputData(tmp_path))
+    sim.run(progress=False)
+    restePop = notPutUp(sim)
+    putUp = sim.metrics()['log']['Population put up']
+    assert 0 < restePop < sim.sumPopALoger
+    assert restePop + putUp == sim.sumPopALoger
+    # Surface reportée d'une année sur l'autre : négative quand il reste à construire
+    assert 0 < sim.resteSrf <= sum(sim.dicSrf.values())
+    assert sim.preBuilt == -sim.resteSrf < 0
+    assert int(sim.metrics()['log']['Unbuilt area']) == round(sim.resteSrf)
+
+# Dernière année où l'on a logé plus que demandé (dernière cellule construite) : le reste à loger vaut 0
+def test_population_overshoot_is_zero(tmp_path):
+    synthesize(tmp_path, size=40, nbIris=4)
+    sim = Simulation(Parameters(2.0, finalYear=2017), InputData(tmp_path))
+    sim.run(progress=False)
+    assert sim.restePop < 0
+    assert notPutUp(sim) == 0
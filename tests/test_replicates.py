@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+import pytest
+import numpy as np
+from synthetic import synthesize
+from simulation import Parameters, InputData, SimulationBatch
+
+# Les sorties propres à une simulation ne sont pas écrites par les réplicats : refusées au lieu d'être ignorées
+@pytest.mark.parametrize('option', [dict(events=True), dict(irisYears=True), dict(checkpoints='2016'), dict(resume='checkpoint.bundle'),
+                                    dict(tiffs=True, snaps=True), dict(snapStack=True), dict(profile=True)])
+def test_replicates_reject_per_run_outputs(option):
+    with pytest.raises(ValueError):
+        Parameters(1.2, replicates=4, **option)
+    with pytest.raises(ValueError):
+        Parameters(1.2, batchSize=4, **option)
+
+# Les réplicats ne calculent que ce qu'agrège Replicates, avec les mêmes valeurs que results()
+def test_replicate_results_match_results(tmp_path):
+    synthesize(tmp_path, size=40, nbIris=4)
+    batch = SimulationBatch(Parameters(1.2, finalYear=2017), InputData(tmp_path), [1, 2])
+    batch.run(progress=False)
+    for partial, full in zip(batch.replicateResults(), batch.results()):
+        assert partial['mesures'] == full['mesures']
+        assert partial['consoOcs'] == full['consoOcs']
+        for name, (array, dtype) in partial['outputs'].items():
+            assert full['outputs'][name][1] == dtype
+            assert np.array_equal(full['outputs'][name][0], array)
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import pytest
+import subprocess
+from pathlib import Path
+from synthetic import synthesize
+from simulation import Parameters, InputData, Simulation
+from simulate import simulate
+
+# Une erreur pendant la simulation est consignée dans log.txt puis relancée, sans SystemExit
+def test_simulate_raises(tmp_path, monkeypatch):
+    synthesize(tmp_path/'data', size=40, nbIris=4)
+    data = InputData(tmp_path/'data')
+    def fail(self, *args, **kwargs):
+        raise RuntimeError('run failed')
+    monkeypatch.setattr(Simulation, 'run', fail)
+    params = Parameters(1.2, finalYear=2016)
+    with pytest.raises(RuntimeError):
+        simulate(params, data, tmp_path/'out')
+    log = (tmp_path/'out'/params.projectName(data.pixSize)/'log.txt').read_text()
+    assert 'run failed' in log
+
+# En ligne de commande, un échec sort avec un code non nul
+def test_command_line_exit_code(tmp_path):
+    script = Path(__file__).resolve().parent.parent/'simulate.py'
+    done = subprocess.run([sys.executable, str(script), str(tmp_path/'absent'), str(tmp_path/'out'), '1.2'],
+                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=os.environ)
+    assert done.returncode == 1
+    assert b'*** Error' in done.stdout
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from synthetic import synthesize
+from simulation import Parameters, InputData
+from simulate import simulate
+from store import load, ingest, readRun
+
+# Mêmes champs et mêmes valeurs (NaN compris)
+def assertSameColumns(a, b):
+    assert set(a) == set(b)
+    for name in a:
+        np.testing.assert_array_equal(a[name], b[name], err_msg=name)
+
+# Un répertoire de projet ingéré donne, champ par champ, la ligne que simulate.py ajoute lui-même avec store
+def test_ingested_row_matches_direct_row(tmp_path):
+    synthesize(tmp_path/'data', size=40, nbIris=4)
+    data = InputData(tmp_path/'data')
+    params = Parameters(1.2, finalYear=2017, seed=7, sirene=2, routes=0, maxUsedSrfPla=150, store=str(tmp_path/'direct'))
+    simulate(params, data, tmp_path/'out')
+    ingest(tmp_path/'out', tmp_path/'ingested')
+    direct, ingested = load(tmp_path/'direct'), load(tmp_path/'ingested')
+    assertSameColumns(direct, ingested)
+    assert ingested['seed'].tolist() == [7]
+    assert not np.isnan(ingested['Total time']).any()
+
+    # Répertoire plus ancien, sans parametres.csv : les poids d'intérêt sont relus dans coefficients_interet.csv
+    project = tmp_path/'out'/params.projectName(data.pixSize)
+    (project/'parametres.csv').unlink()
+    row = readRun(project)
+    assert [row[key] for key in ['sirene', 'transport', 'routes', 'ecologie']] == [2, 1, 0, 1]
+    assert 'seed' not in row
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import gdal
+import warnings
+import pytest
+import numpy as np
+from toolbox import to_tif, to_array, tifProfiles, creationOptions
+
+# Sans pilote COG (GDAL < 3.1), le profil cog écrit un GTiff tuilé au lieu d'échouer
+def test_cog_profile_without_cog_driver(tmp_path, monkeypatch):
+    getDriver = gdal.GetDriverByName
+    monkeypatch.setattr(gdal, 'GetDriverByName', lambda name: None if name == 'COG' else getDriver(name))
+    array = np.arange(64 * 64, dtype=np.uint16).reshape(64, 64)
+    with pytest.warns(UserWarning):
+        to_tif(array, 'uint16', '', (0.0, 50.0, 0.0, 0.0, 0.0, -50.0), tmp_path/'cog.tif', profile='cog')
+    assert np.array_equal(to_array(tmp_path/'cog.tif'), array)
+
+# Le raster intermédiaire du profil cog porte le nom du fichier écrit : rien n'est créé sous un nom vide
+def test_cog_profile_names_memory_raster(tmp_path, monkeypatch):
+    names = []
+    class Recording:
+        def __init__(self, driver):
+            self.driver = driver
+        def Create(self, path, *args):
+            names.append(path)
+            return self.driver.Create(path, *args)
+        def __getattr__(self, name):
+            return getattr(self.driver, name)
+    getDriver = gdal.GetDriverByName
+    monkeypatch.setattr(gdal, 'GetDriverByName', lambda name: getDriver(name) and Recording(getDriver(name)))
+    array = np.ones([16, 16], np.uint8)
+    with warnings.catch_warnings():
+        # Sans pilote COG, le repli écrit directement le GTiff
+        warnings.simplefilter('ignore')
+        to_tif(array, 'byte', '', (0.0, 50.0, 0.0, 0.0, 0.0, -50.0), tmp_path/'cog.tif', profile='cog')
+    assert names == [str(tmp_path/'cog.tif')]
+    assert np.array_equal(to_array(tmp_path/'cog.tif'), array)
+
+# Sans ZSTD dans le pilote GTiff (GDAL < 2.3), le profil zstd est compressé en DEFLATE au lieu de ne pas l'être du tout
+def test_zstd_profile_without_zstd(monkeypatch):
+    class NoZstd:
+        def __init__(self, driver):
+            self.driver = driver
+        def GetMetadataItem(self, name):
+            return self.driver.GetMetadataItem(name).replace('<Value>ZSTD</Value>', '')
+    getDriver = gdal.GetDriverByName
+    monkeypatch.setattr(gdal, 'GetDriverByName', lambda name: NoZstd(getDriver(name)))
+    with pytest.warns(UserWarning):
+        options = creationOptions(tifProfiles['zstd'], 'uint16')
+    assert 'COMPRESS=DEFLATE' in options and 'COMPRESS=ZSTD' not in options
@@ -1,9 +1,13 @@
 import os
 import sys
 import gdal
+import warnings
 import numpy as np
 from time import time
+from threading import BoundedSemaphore, Lock
+from collections import OrderedDict
 from multiprocessing import Process
+from concurrent.futures import ThreadPoolExecutor
 
 # Pour affichage dynamique de la progression
 def printer(string):
@@ -33,24 +37,106 @@ def getTime(start):
     execSec = round(execTime % 60)
     return '%im %is' %(execMin, execSec)
 
-# Enregistre un fichier .tif à partir d'un array et de variables GDAL stockées au préalable
-def to_tif(array, dtype, proj, geot, path):
-    cols, rows = array.shape[1], array.shape[0] # x, y
-    driver = gdal.GetDriverByName('GTiff')
+# Type GDAL correspondant aux noms de types utilisés dans les scripts
+def gdalType(dtype):
     if dtype == 'byte':
-        dtype = gdal.GDT_Byte
+        return gdal.GDT_Byte
     elif dtype == 'float32':
-        dtype = gdal.GDT_Float32
+        return gdal.GDT_Float32
     elif dtype == 'uint16':
-        dtype = gdal.GDT_UInt16
+        return gdal.GDT_UInt16
     elif dtype == 'uint32':
-        dtype = gdal.GDT_UInt32
+        return gdal.GDT_UInt32
     else :
-        dtype = gdal.GDT_Unknown
-    ds = driver.Create(str(path), cols, rows, 1, dtype)
+        return gdal.GDT_Unknown
+
+# Profils de création des .tif : compression (avec prédicteur), tuilage, aperçus internes, format COG et nodata NaN pour les rasters flottants
+# plain correspond aux .tif d'origine, non compressés et en bandes ; tous les profils restent lisibles par QGIS et R (GDAL)
+tifProfiles = OrderedDict([
+    ('plain', {}),
+    ('deflate', {'compress': 'DEFLATE', 'tiled': True, 'nodata': True}),
+    ('zstd', {'compress': 'ZSTD', 'tiled': True, 'nodata': True}),
+    ('lzw', {'compress': 'LZW', 'tiled': True, 'nodata': True}),
+    ('overviews', {'compress': 'DEFLATE', 'tiled': True, 'nodata': True, 'overviews': True}),
+    ('cog', {'compress': 'DEFLATE', 'nodata': True, 'cog': True})
+])
+# Profil utilisé quand to_tif() est appelée sans profil
+tifProfile = 'plain'
+
+def setTifProfile(name):
+    global tifProfile
+    if name not in tifProfiles:
+        raise ValueError('tifProfile should be one of ' + ', '.join(tifProfiles))
+    tifProfile = name
+
+# Compression proposée par le pilote GTiff de ce GDAL (ZSTD n'existe qu'à partir de GDAL 2.3)
+def hasCompression(name):
+    optionList = gdal.GetDriverByName('GTiff').GetMetadataItem('DMD_CREATIONOPTIONLIST') or ''
+    return name in optionList
+
+# Sans ZSTD, GDAL ignore l'option COMPRESS avec un simple avertissement et écrit des tuiles non compressées : on passe en DEFLATE
+def zstdFallback(profile):
+    warnings.warn('the GTiff driver of this GDAL has no ZSTD compression (GDAL >= 2.3) : the zstd profile is written with DEFLATE')
+    return dict(profile, compress='DEFLATE')
+
+# Options de création GTiff (ou COG) d'un profil ; dtype peut être un nom de type des scripts ou de GDAL ('float32', 'Float32'...)
+def creationOptions(profile, dtype):
+    options = []
+    isFloat = 'float' in str(dtype).lower()
+    if profile.get('compress') == 'ZSTD' and not hasCompression('ZSTD'):
+        profile = zstdFallback(profile)
+    if profile.get('compress'):
+        options.append('COMPRESS=' + profile['compress'])
+        if profile.get('cog'):
+            options.append('PREDICTOR=YES')
+        else:
+            # Différences horizontales pour les entiers, prédicteur flottant pour les réels
+            options.append('PREDICTOR=' + ('3' if isFloat else '2'))
+        options.append('BIGTIFF=IF_SAFER')
+    if profile.get('tiled'):
+        options += ['TILED=YES', 'BLOCKXSIZE=256', 'BLOCKYSIZE=256']
+    if profile.get('cog'):
+        options += ['BLOCKSIZE=256', 'OVERVIEWS=AUTO', 'RESAMPLING=NEAREST']
+    return options
+
+# Options du pilote GTiff pour les .tif écrits par d'autres outils GDAL (gdal.Rasterize...) : un profil COG y devient un GTiff tuilé et compressé
+def gtiffOptions(name, dtype):
+    profile = dict(tifProfiles[name or tifProfile])
+    if profile.pop('cog', False):
+        profile['tiled'] = True
+    return creationOptions(profile, dtype)
+
+# Le pilote COG n'existe qu'à partir de GDAL 3.1 : sans lui, le profil cog devient un GTiff tuilé et compressé avec aperçus internes
+def cogFallback():
+    warnings.warn('the COG driver needs GDAL >= 3.1 : the cog profile is written as a tiled GTiff with overviews')
+    return dict(tifProfiles['cog'], cog=False, tiled=True, overviews=True)
+
+# Enregistre un fichier .tif à partir d'un array et de variables GDAL stockées au préalable
+# profile : nom d'un profil de tifProfiles (profil par défaut si None) ; nodata : valeur à déclarer, NaN par défaut pour les flottants si le profil le prévoit
+def to_tif(array, dtype, proj, geot, path, profile=None, nodata=None):
+    cols, rows = array.shape[1], array.shape[0] # x, y
+    profile = tifProfiles[profile or tifProfile]
+    if profile.get('cog') and gdal.GetDriverByName('COG') is None:
+        profile = cogFallback()
+    if nodata is None and profile.get('nodata') and dtype == 'float32':
+        nodata = float('nan')
+    if profile.get('cog'):
+        # Le pilote COG ne sait que copier un raster existant : on passe par un raster en mémoire, nommé d'après le fichier
+        # écrit et non d'un nom vide, qu'un pilote enregistrant ses rasters résout en .json et .npy dans le répertoire courant
+        ds = gdal.GetDriverByName('MEM').Create(str(path), cols, rows, 1, gdalType(dtype))
+    else:
+        driver = gdal.GetDriverByName('GTiff')
+        ds = driver.Create(str(path), cols, rows, 1, gdalType(dtype), creationOptions(profile, dtype))
     ds.SetProjection(proj)
     ds.SetGeoTransform(geot)
-    ds.GetRasterBand(1).WriteArray(array)
+    band = ds.GetRasterBand(1)
+    if nodata is not None:
+        band.SetNoDataValue(nodata)
+    band.WriteArray(array)
+    if profile.get('overviews'):
+        ds.BuildOverviews('NEAREST', [2, 4, 8, 16])
+    if profile.get('cog'):
+        gdal.GetDriverByName('COG').CreateCopy(str(path), ds, options=creationOptions(profile, dtype))
     ds = None
 
 # Convertit un tif en numpy array
@@ -61,3 +147,113 @@ def to_array(tif, dtype=None):
     else:
         return ds.ReadAsArray()
     ds = None
+
+# Écriture de .tif en tâche de fond par un pool de threads, pour que l'encodage et l'écriture se fassent pendant la suite du calcul
+# Au plus maxPending écritures en attente : write() bloque au-delà, ce qui borne la mémoire occupée par les copies
+# Les arrays sont copiés à la soumission (sauf copy=False), l'appelant peut donc continuer à les modifier
+# La première erreur d'écriture est relancée par l'appel suivant à write() ou par close()
+class TifWriter:
+    def __init__(self, workers=2, maxPending=8, profile=None):
+        self.profile = profile
+        self.executor = ThreadPoolExecutor(workers)
+        self.slots = BoundedSemaphore(maxPending)
+        self.futures = []
+
+    def write(self, array, dtype, proj, geot, path, copy=True):
+        self.submit(to_tif, array, copy, dtype, proj, geot, path, self.profile)
+
+    # Écrit l'année year d'un TifStack
+    def writeBand(self, stack, year, array, copy=True):
+        self.submit(stack.write, array, copy, year)
+
+    def submit(self, function, array, copy, *args):
+        self.check()
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(function, array.copy() if copy else array, *args)
+        except:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda f: self.slots.release())
+        self.futures.append(future)
+
+    # Relance l'erreur d'une écriture terminée en échec, et oublie les écritures réussies
+    def check(self):
+        pending = []
+        for future in self.futures:
+            if future.done():
+                if future.exception():
+                    raise future.exception()
+            else:
+                pending.append(future)
+        self.futures = pending
+
+    # Attend la fin de toutes les écritures
+    def close(self):
+        self.executor.shutdown(wait=True)
+        futures, self.futures = self.futures, []
+        for future in futures:
+            if future.exception():
+                raise future.exception()
+
+    def __enter__(self):
+        return self
+
+    # En cas d'exception dans le bloc, on attend les écritures sans masquer l'exception d'origine
+    def __exit__(self, type, value, tb):
+        if type is None:
+            self.close()
+        else:
+            self.executor.shutdown(wait=True)
+            self.futures = []
+
+# Série temporelle dans un seul .tif : une bande par année, créées vides puis écrites au fil de la simulation
+# Tuilé, compressé et entrelacé par bande : chaque bande n'est écrite qu'une fois, et la série d'un pixel se lit sans ouvrir un fichier par année
+# Les années sont dans la description et la métadonnée YEAR de chaque bande, et dans la métadonnée YEARS du fichier
+# La compression est celle du profil (DEFLATE si le profil n'en a pas) ; pas de COG ni d'aperçus, les bandes étant écrites une à une
+# Avec update (reprise), un fichier existant est rouvert en écriture : les bandes des années déjà simulées sont conservées
+class TifStack:
+    def __init__(self, path, years, dtype, proj, geot, rows, cols, profile=None, update=False):
+        self.years = [int(y) for y in years]
+        # Plusieurs threads de TifWriter peuvent écrire dans le même fichier
+        self.lock = Lock()
+        if update and os.path.exists(str(path)):
+            self.ds = gdal.Open(str(path), gdal.GA_Update)
+            if stackYears(self.ds) != self.years:
+                raise ValueError(str(path) + ' does not have the years of this simulation')
+            return
+        profile = dict(tifProfiles[profile or tifProfile], tiled=True, cog=False)
+        profile['compress'] = profile.get('compress', 'DEFLATE')
+        options = creationOptions(profile, dtype) + ['INTERLEAVE=BAND']
+        driver = gdal.GetDriverByName('GTiff')
+        self.ds = driver.Create(str(path), cols, rows, len(self.years), gdalType(dtype), options)
+        self.ds.SetProjection(proj)
+        self.ds.SetGeoTransform(geot)
+        self.ds.SetMetadataItem('YEARS', ','.join(str(y) for y in self.years))
+        for i, year in enumerate(self.years):
+            band = self.ds.GetRasterBand(i + 1)
+            band.SetDescription(str(year))
+            band.SetMetadataItem('YEAR', str(year))
+            if profile.get('nodata') and dtype == 'float32':
+                band.SetNoDataValue(float('nan'))
+
+    def write(self, array, year):
+        with self.lock:
+            band = self.ds.GetRasterBand(self.years.index(int(year)) + 1)
+            band.WriteArray(array)
+            band.FlushCache()
+
+    def close(self):
+        with self.lock:
+            self.ds.FlushCache()
+            self.ds = None
+
+# Années d'un TifStack
+def stackYears(ds):
+    return [int(y) for y in ds.GetMetadataItem('YEARS').split(',')]
+
+# Série temporelle d'un pixel d'un TifStack : {année: valeur}
+def readSeries(path, row, col):
+    ds = gdal.Open(str(path))
+    values = ds.ReadAsArray(col, row, 1, 1).reshape(-1)
+    return OrderedDict(zip(stackYears(ds), values.tolist()))
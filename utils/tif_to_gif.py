@@ -54,6 +54,13 @@ def to_array(tif, dtype=None):
         return ds.ReadAsArray()
     ds = None
 
+# Lit une bande d'un .tif multi-bandes (instantanés snapStack, une bande par année)
+def band_array(tif, band, dtype):
+    ds = gdal.Open(tif)
+    array = ds.GetRasterBand(band).ReadAsArray().astype(dtype)
+    ds = None
+    return array
+
 # Version modifiée de to_tif sans géoréférencement
 def to_tif(array, dtype, path):
     cols, rows = array.shape[1], array.shape[0] # x, y
@@ -77,62 +84,82 @@ if 'outDir' not in globals():
 
 try:
     # Création des variables GDAL pour écriture de raster, indispensables pour la fonction to_tif()
-    snapsType = os.listdir(inDir)
+    # Un répertoire par type d'instantané avec un .tif par année, ou un .tif par type avec une bande par année (snapStack)
+    snapsType = [s for s in os.listdir(inDir) if os.path.isdir(inDir + s) or os.path.splitext(s)[1] == '.tif']
     snapsType.sort()
     c = 0
-    for basename in snapsType:
+    for entry in snapsType:
+        stack = os.path.isfile(inDir + entry)
+        basename = os.path.splitext(entry)[0]
         print('Processing "' + basename + '"' )
         if basename == 'urbanisation':
             maxV = 1
             highValue, npType = getHighValue('byte')
             dataType = 'byte'
+        elif basename == 'contiguite':
+            maxV = 1
+            highValue, npType = getHighValue('uint16')
+            dataType = 'uint16'
         else:
             highValue, npType = getHighValue('uint16')
             dataType = 'uint16'
 
-        d = inDir + basename + '/'
-        lastFile = d + os.listdir(d)[len(os.listdir(d)) - 1]
-        ds = gdal.Open(lastFile)
+        # Images à assembler : (année, fonction de lecture avec conversion de type)
+        if stack:
+            d = inDir + basename + '_'
+            ds = gdal.Open(inDir + entry)
+            years = ds.GetMetadataItem('YEARS').split(',')
+            frames = [(year, lambda dtype, b=b: band_array(inDir + entry, b, dtype)) for b, year in enumerate(years, 1)]
+        else:
+            d = inDir + basename + '/'
+            files = [file for file in os.listdir(d) if os.path.splitext(file)[1] == '.tif']
+            frames = [(file.replace('.tif','').split('_')[1], lambda dtype, file=file: to_array(d + file, dtype)) for file in files]
+            ds = gdal.Open(d + files[0])
         geot = ds.GetGeoTransform()
         pixSize = int(geot[1])
         srfCell = pixSize * pixSize
-        tif = ds.GetRasterBand(1).ReadAsArray().astype(npType)
-        driver = gdal.GetDriverByName('GTiff')
         ds = None
+        tif = max(frames, key=lambda f: f[0])[1](npType)
+        driver = gdal.GetDriverByName('GTiff')
         if os.path.exists(d + 'tmp'):
             rmtree(d + 'tmp')
         os.makedirs(d + 'tmp')
 
         if 'delay' not in globals():
-            delay = str(round(len(os.listdir(d))/2))
-
-        for file in os.listdir(d):
-            if os.path.splitext(file)[1] == '.tif':
-                if basename == 'urbanisation':
-                    array = to_array(d + file, np.uint8)
-                    array = (array * highValue / maxV).astype(npType)
-                elif basename == 'surface_sol':
-                    maxV = srfCell
-                    array = to_array(d + file, np.uint32)
-                    array = (array * highValue / maxV).astype(npType)
-                else:
-                    if 'maxValues' in globals():
-                        maxV = maxValues[c]
-                        if maxV == 0:
-                            maxV = tif.max()
-                    else:
+            delay = str(round(len(frames)/2))
+
+        for year, read in frames:
+            if basename == 'urbanisation':
+                array = read(np.uint8)
+                array = (array * highValue / maxV).astype(npType)
+            elif basename == 'contiguite':
+                # Taux de contiguïté entre 0 et 1, NaN en bordure
+                array = np.nan_to_num(read(np.float32))
+                array = (array * highValue / maxV).astype(npType)
+            elif basename == 'surface_sol':
+                maxV = srfCell
+                array = read(np.uint32)
+                array = (array * highValue / maxV).astype(npType)
+            else:
+                if 'maxValues' in globals():
+                    maxV = maxValues[c]
+                    if maxV == 0:
                         maxV = tif.max()
-                    array = to_array(d + file, np.uint32)
-                    array = (array * highValue / maxV).astype(npType)
+                else:
+                    maxV = tif.max()
+                array = read(np.uint32)
+                array = (array * highValue / maxV).astype(npType)
 
-                to_tif(array, dataType, d + 'tmp/' + basename + file.replace('.tif','').split('_')[1] + '.tif')
+            to_tif(array, dataType, d + 'tmp/' + basename + year + '.tif')
 
         if not oneOutDir:
-            outDir = d
+            outDir = inDir if stack else d
         os.system('convert -delay ' + delay + ' -loop 0 ' + d + 'tmp/*.tif ' + outDir + 'evo_' + basename + '.gif')
         rmtree(d + 'tmp')
 
-        c += 1
+        # Les contiguïtés n'utilisent pas maxValues
+        if basename != 'contiguite':
+            c += 1
 
     print('Done.')
 